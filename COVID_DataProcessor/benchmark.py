@@ -0,0 +1,50 @@
+from COVID_DataProcessor.datatype import Country
+from COVID_DataProcessor.io import load_raw_files
+from COVID_DataProcessor.util import get_period
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import pandas as pd
+import numpy as np
+
+
+def generate_synthetic_raw_data(raw_path, n_files=500, n_rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    query_period = get_period('2020-04-12', '2030-01-01', out_date_format='%m-%d-%Y')[:n_files]
+    regions = [f'Region {i}' for i in range(60)]
+
+    raw_path_list = []
+    for date in query_period:
+        raw_df = pd.DataFrame({'Province_State': rng.choice(regions, n_rows), 'Country_Region': 'US',
+                               'Last_Update': f'{date} 04:30:00', 'Lat': rng.random(n_rows),
+                               'Long_': rng.random(n_rows), 'Confirmed': rng.integers(0, 10 ** 6, n_rows),
+                               'Deaths': rng.integers(0, 10 ** 4, n_rows), 'Recovered': rng.random(n_rows),
+                               'Active': rng.random(n_rows), 'FIPS': rng.integers(0, 10 ** 5, n_rows),
+                               'Incident_Rate': rng.random(n_rows), 'People_Tested': rng.random(n_rows),
+                               'UID': rng.integers(0, 10 ** 8, n_rows), 'ISO3': 'USA'})
+        file_path = join(raw_path, f'{date}.csv')
+        raw_df.to_csv(file_path, index=False)
+        raw_path_list.append(file_path)
+
+    return raw_path_list
+
+
+def benchmark_load_raw_data(n_files=500, n_rows=3000, worker_counts=(1, 2, 4, 8), use_processes=False):
+    with TemporaryDirectory() as raw_path:
+        raw_path_list = generate_synthetic_raw_data(raw_path, n_files, n_rows)
+
+        result_df = pd.DataFrame(index=list(worker_counts), columns=['seconds', 'speedup'])
+        result_df.index.name = 'max_workers'
+        for max_workers in worker_counts:
+            start = perf_counter()
+            load_raw_files(Country.US, raw_path_list, max_workers, use_processes)
+            result_df.loc[max_workers, 'seconds'] = perf_counter() - start
+
+    result_df['speedup'] = result_df.loc[worker_counts[0], 'seconds'] / result_df['seconds']
+    return result_df
+
+
+if __name__ == '__main__':
+    print(benchmark_load_raw_data(use_processes=False))
+    print(benchmark_load_raw_data(use_processes=True))
@@ -1,9 +1,12 @@
 from COVID_DataProcessor.util import get_date_format
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from datetime import datetime, date
 from enum import Enum
 from copy import copy
 
+import pandas as pd
+import numpy as np
 import hashlib
 
 
@@ -314,6 +317,77 @@ class DatasetInfo:
         return hash_key
 
 
+@dataclass
+class DataCube:
+    values: np.ndarray
+    regions: list
+    dates: list
+    metrics: list
+    dtypes: list = None
+
+    @classmethod
+    def from_dict(cls, data_dict):
+        regions = list(data_dict.keys())
+        index = data_dict[regions[0]].index
+        columns = data_dict[regions[0]].columns
+
+        values = np.stack([get_aligned_values(data_dict[region], index, columns) for region in regions])
+        dtypes = [get_aligned_dtypes(data_dict[region], index, columns) for region in regions]
+        return cls(values, regions, index.to_list(), columns.to_list(), dtypes)
+
+    def get_metric(self, metric):
+        return self.values[:, :, self.metrics.index(metric)]
+
+    def get_region(self, region):
+        i = self.regions.index(region)
+        region_df = pd.DataFrame(self.values[i], index=self.dates, columns=self.metrics, copy=True)
+        region_df.index.name = 'date'
+        if self.dtypes is None:
+            return region_df
+
+        dtypes = {metric: dtype for metric, dtype in zip(self.metrics, self.dtypes[i]) if dtype != 'float64'}
+        return region_df.astype(dtypes) if len(dtypes) > 0 else region_df
+
+    def to_dict(self):
+        return {region: self.get_region(region) for region in self.regions}
+
+
+class LazyRegionDict(Mapping):
+    def __init__(self, regions, loader):
+        self.regions = list(regions)
+        self.region_set = frozenset(self.regions)
+        self.loader = loader
+        self.loaded = dict()
+
+    def __getitem__(self, region):
+        if region not in self.loaded:
+            if region not in self.region_set:
+                raise KeyError(region)
+            self.loaded[region] = self.loader(region)
+        return self.loaded[region]
+
+    def __contains__(self, region):
+        return region in self.region_set
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    def __len__(self):
+        return len(self.regions)
+
+
+def get_aligned_values(data_df, index, columns):
+    if data_df.index.equals(index) and data_df.columns.equals(columns):
+        return data_df.to_numpy(dtype=float)
+    return data_df.reindex(index=index, columns=columns).to_numpy(dtype=float)
+
+
+def get_aligned_dtypes(data_df, index, columns):
+    if not data_df.index.equals(index) and not index.isin(data_df.index).all():
+        return ['float64' for _ in columns]
+    return [str(data_df[column].dtype) if column in data_df.columns else 'float64' for column in columns]
+
+
 def get_country_name(country):
     if country == Country.US or country == Country.US_CONFIRMED:
         return country.name
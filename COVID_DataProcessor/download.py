@@ -1,48 +1,149 @@
-from COVID_DataProcessor.datatype import Country
-from COVID_DataProcessor.io import load_links, load_regions, load_raw_data
-from COVID_DataProcessor.io import save_raw_data, save_raw_file, save_origin_data
+from COVID_DataProcessor.datatype import Country, get_country_name
+from COVID_DataProcessor.io import load_links, load_regions, load_raw_data, load_raw_store
+from COVID_DataProcessor.io import save_raw_file, save_raw_stream, save_origin_data, read_raw_file
+from COVID_DataProcessor.io import load_raw_manifest, update_raw_manifest, get_manifest_entry, is_raw_file_synced
 from COVID_DataProcessor.util import get_period
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import pandas as pd
+import numpy as np
 import requests
+import hashlib
 import io
 import re
 
 
-def download_raw_file(link):
-    raw_file = requests.get(link)
-    raw_text = io.StringIO(raw_file.text)
+CSSE_ORIGIN_COLUMNS = {'Province_State': 'region', 'Confirmed': 'confirmed', 'Deaths': 'deaths',
+                       'Recovered': 'recovered', 'Active': 'active'}
+
+
+def get_session(max_workers=1, retries=3, backoff_factor=0.5):
+    retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def request_raw_file(link, session=None, headers=None, stream=False):
+    requester = requests if session is None else session
+    response = requester.get(link, headers=headers, stream=stream)
+    response.raise_for_status()
+    return response
+
+
+def parse_raw_file(response):
+    raw_text = io.StringIO(response.text)
     record_df = pd.read_csv(raw_text, sep=',')
     return record_df
 
 
-def download_raw_data(country):
+def download_raw_file(link, session=None):
+    return parse_raw_file(request_raw_file(link, session))
+
+
+def get_conditional_headers(manifest_df, name):
+    headers = dict()
+    if name not in manifest_df.index:
+        return headers
+
+    if not pd.isna(manifest_df.loc[name, 'etag']):
+        headers.update({'If-None-Match': manifest_df.loc[name, 'etag']})
+    if not pd.isna(manifest_df.loc[name, 'last_modified']):
+        headers.update({'If-Modified-Since': manifest_df.loc[name, 'last_modified']})
+
+    return headers
+
+
+def get_sync_period(country, query_period, manifest_df, revalidate=False):
+    sync_period = []
+    headers_list = []
+
+    for date in query_period:
+        if not is_raw_file_synced(country, date, manifest_df):
+            sync_period.append(date)
+            headers_list.append(None)
+        elif revalidate:
+            sync_period.append(date)
+            headers_list.append(get_conditional_headers(manifest_df, date))
+
+    downloaded = len(query_period) - headers_list.count(None)
+    print(f'{downloaded} of {len(query_period)} {get_country_name(country)} raw files are already downloaded')
+    return sync_period, headers_list
+
+
+def download_daily_file(country, link, date, session, headers=None):
+    print(f'download {get_country_name(country)} raw data on {date}')
+    try:
+        response = request_raw_file(f'{link}{date}.csv', session, headers)
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            raise
+        print(f'Raw data of {get_country_name(country)} on {date} is not existing!')
+        return None, None
+
+    if response.status_code == 304:
+        return None, None
+
+    raw_df = parse_raw_file(response)
+    save_raw_file(country, raw_df, date)
+    return raw_df, get_manifest_entry(country, date, response.headers, hashlib.sha1(response.content).hexdigest())
+
+
+def download_daily_files(country, link, query_period, max_workers=1, incremental=False, revalidate=False):
+    if incremental:
+        query_period, headers_list = get_sync_period(country, query_period, load_raw_manifest(country), revalidate)
+    else:
+        headers_list = [None for _ in query_period]
+
+    with get_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(download_daily_file, repeat(country), repeat(link),
+                                    query_period, repeat(session), headers_list))
+
+    raw_dict = dict()
+    entry_dict = dict()
+    for date, (raw_df, entry) in zip(query_period, results):
+        if raw_df is None:
+            continue
+        raw_dict.update({date: raw_df})
+        entry_dict.update({date: entry})
+
+    update_raw_manifest(country, entry_dict)
+    return raw_dict
+
+
+def download_raw_data(country, max_workers=1, incremental=False, revalidate=False):
     data_info = load_links(country)
 
     if country == Country.US:
-        raw_dict = download_us_raw_data(data_info)
+        raw_dict = download_us_raw_data(data_info, max_workers, incremental, revalidate)
     elif country == Country.CHINA:
-        raw_dict = download_china_raw_data(data_info)
+        raw_dict = download_china_raw_data(data_info, max_workers, incremental, revalidate)
     elif country == Country.ITALY:
-        raw_dict = download_national_raw_data(country, data_info)
+        raw_dict = download_national_raw_data(country, data_info, incremental)
     elif country == Country.INDIA:
-        raw_dict = download_national_raw_data(country, data_info)
+        raw_dict = download_national_raw_data(country, data_info, incremental)
     elif country == Country.US_CONFIRMED:
-        raw_dict = download_national_raw_data(country, data_info)
+        raw_dict = download_national_raw_data(country, data_info, incremental)
     else:
         raise Exception(f'not registered country, {country}')
 
     return raw_dict
 
 
-def get_origin_data(country):
+def get_origin_data(country, use_store=False):
     data_info = load_links(country)
 
     if country == Country.US:
-        origin_dict = get_us_origin_data(data_info)
+        origin_dict = get_us_origin_data(data_info, use_store)
     elif country == Country.CHINA:
-        origin_dict = get_china_origin_data(data_info)
+        origin_dict = get_china_origin_data(data_info, use_store)
     elif country == Country.ITALY:
         origin_dict = get_italy_origin_data(data_info)
     elif country == Country.INDIA:
@@ -55,81 +156,91 @@ def get_origin_data(country):
     return origin_dict
 
 
-def download_us_raw_data(data_info):
+def download_us_raw_data(data_info, max_workers=1, incremental=False, revalidate=False):
     query_period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%m-%d-%Y')
-
-    raw_dict = dict()
-    for i, date in enumerate(query_period):
-        print(f'download US raw data on {date}')
-
-        link = data_info['link']
-        raw_df = download_raw_file(f'{link}{date}.csv')
-        save_raw_file(Country.US, raw_df, date)
-        raw_dict.update({date: raw_df})
-
+    raw_dict = download_daily_files(Country.US, data_info['link'], query_period,
+                                    max_workers, incremental, revalidate)
     return raw_dict
 
 
-def download_csse_raw_data(raw_dict, country_name, link, start_date, end_date):
+def download_csse_raw_data(raw_dict, country_name, link, start_date, end_date,
+                           max_workers=1, incremental=False, revalidate=False):
+    print(f'download {country_name} raw data from {start_date} to {end_date}')
     query_period = get_period(start_date, end_date, out_date_format='%m-%d-%Y')
-    for i, date in enumerate(query_period):
-        print(f'download {country_name} raw data on {date}')
-        raw_df = download_raw_file(f'{link}{date}.csv')
-        save_raw_file(Country.CHINA, raw_df, date)
-        raw_dict.update({date: raw_df})
-
+    raw_dict.update(download_daily_files(Country.CHINA, link, query_period, max_workers, incremental, revalidate))
     return raw_dict
 
 
-def download_china_raw_data(data_info):
+def download_china_raw_data(data_info, max_workers=1, incremental=False, revalidate=False):
     raw_dict = dict()
     raw_dict = download_csse_raw_data(raw_dict, 'Mainland China', data_info['link'],
-                                      data_info['start_date'], '2020-03-21')
+                                      data_info['start_date'], '2020-03-21', max_workers, incremental, revalidate)
     raw_dict = download_csse_raw_data(raw_dict, 'China', data_info['link'],
-                                      '2020-03-22', data_info['end_date'])
+                                      '2020-03-22', data_info['end_date'], max_workers, incremental, revalidate)
     return raw_dict
 
 
-def download_national_raw_data(country, data_info):
-    raw_df = download_raw_file(data_info['link'])
-    raw_dict = {data_info.name: raw_df}
-    save_raw_data(country, raw_dict)
+def download_national_raw_data(country, data_info, incremental=False):
+    name = data_info.name
+    manifest_df = load_raw_manifest(country)
+    synced = is_raw_file_synced(country, name, manifest_df)
+    headers = get_conditional_headers(manifest_df, name) if synced else None
+
+    with get_session() as session, request_raw_file(data_info['link'], session, headers, stream=True) as response:
+        if response.status_code == 304:
+            print(f'raw data of {name} is up to date')
+            return dict() if incremental else load_raw_data(country)
+
+        file_path, content_hash = save_raw_stream(country, response, name)
+
+    update_raw_manifest(country, {name: get_manifest_entry(country, name, response.headers, content_hash)})
+    raw_dict = {name: read_raw_file(country, file_path, chunksize=100000)}
     return raw_dict
 
 
-def get_empty_df_dict(data_info):
-    country = Country[data_info.name.upper()]
-    regions = load_regions(country)
-    index_period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%Y-%m-%d')
+def concat_raw_dict(raw_dict, query_period, index_period):
+    raw_df = pd.concat([raw_dict[date] for date in query_period], keys=index_period, names=['date', None])
+    return raw_df.reset_index(level='date').reset_index(drop=True)
+
+
+def load_raw_period(country, query_period, index_period, use_store=False):
+    if not use_store:
+        return concat_raw_dict(load_raw_data(country), query_period, index_period)
+
+    raw_df = load_raw_store(country)
+    missing_dates = set(index_period) - set(raw_df['date'])
+    if len(missing_dates) > 0:
+        raise KeyError(f'raw store of {get_country_name(country)} misses {sorted(missing_dates)}')
+
+    return raw_df.loc[raw_df['date'].isin(index_period)].reset_index(drop=True)
+
+
+def pivot_origin_data(long_df, regions, index_period):
+    columns = ['confirmed', 'deaths', 'recovered', 'active']
+    sum_df = long_df.groupby(['date', 'region'], observed=True)[columns].sum()
+
+    wide_df = sum_df.unstack('region', fill_value=0)
+    wide_df = wide_df.reindex(index=index_period, columns=pd.MultiIndex.from_product([columns, regions]), fill_value=0)
+    wide_df.index.name = 'date'
 
     df_dict = dict()
     for region in regions:
-        data_df = pd.DataFrame(index=index_period, columns=['confirmed', 'deaths', 'recovered', 'active'])
-        data_df.index.name = 'date'
-        df_dict.update({region: data_df})
+        df_dict.update({region: wide_df.xs(region, axis=1, level=1)})
 
     return df_dict
 
 
-def get_us_origin_data(data_info):
+def get_us_origin_data(data_info, use_store=False):
     country = Country[data_info.name.upper()]
     regions = load_regions(country)
-    df_dict = get_empty_df_dict(data_info)
-    raw_dict = load_raw_data(country)
 
     query_period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%m-%d-%Y')
     index_period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%Y-%m-%d')
 
-    for i, date in enumerate(query_period):
-        print(f'get US origin data on {index_period[i]}')
-        raw_df = raw_dict[date]
-
-        for region in regions:
-            region_df = raw_df.loc[raw_df['Province_State'] == region]
-            df_dict[region].loc[index_period[i], 'confirmed'] = region_df['Confirmed'].sum()
-            df_dict[region].loc[index_period[i], 'deaths'] = region_df['Deaths'].sum()
-            df_dict[region].loc[index_period[i], 'recovered'] = region_df['Recovered'].sum(skipna=True)
-            df_dict[region].loc[index_period[i], 'active'] = region_df['Active'].sum(skipna=True)
+    print(f'get US origin data from {index_period[0]} to {index_period[-1]}')
+    raw_df = load_raw_period(country, query_period, index_period, use_store)
+    raw_df = raw_df.rename(columns=CSSE_ORIGIN_COLUMNS)
+    df_dict = pivot_origin_data(raw_df, regions, index_period)
 
     save_origin_data(country, df_dict)
     return df_dict
@@ -139,93 +250,63 @@ def get_us_confirmed_origin_data():
     country = Country.US_CONFIRMED
     raw_dict = load_raw_data(country)
     raw_df = raw_dict[next(iter(raw_dict))]
-
     regions = load_regions(country)
-    tmp_region_df = raw_df.loc[raw_df['Province_State'] == regions[0]]
-    date_columns = [col for col in tmp_region_df.columns.to_list() if re.search(r'\d+\/\d+\/\d+', col)]
+
+    date_columns = [col for col in raw_df.columns.to_list() if re.search(r'\d+\/\d+\/\d+', col)]
     new_columns = get_period(datetime.strptime(date_columns[0], '%m/%d/%y'),
                              datetime.strptime(date_columns[-1], '%m/%d/%y'),
                              out_date_format='%Y-%m-%d')
 
-    origin_df = pd.DataFrame(index=regions, columns=new_columns)
+    print(f'get US_CONFIRMED origin data from {new_columns[0]} to {new_columns[-1]}')
+    origin_df = raw_df.groupby('Province_State', observed=True)[date_columns].sum()
+    origin_df.columns = pd.to_datetime(origin_df.columns, format='%m/%d/%y').strftime('%Y-%m-%d')
+    origin_df = origin_df.reindex(index=regions, columns=new_columns, fill_value=0)
     origin_df.index.name = 'regions'
 
-    for region in regions:
-        print(region)
-        region_df = raw_df.loc[raw_df['Province_State'] == region]
-
-        for date_column in date_columns:
-            date_datetime = datetime.strptime(date_column, '%m/%d/%y')
-            date_str = date_datetime.strftime('%Y-%m-%d')
-            origin_df.loc[region, date_str] = region_df[date_column].sum()
-
     origin_dict = {country.name: origin_df}
     save_origin_data(country, origin_dict)
     return origin_dict
 
 
-def get_china_origin_dict(raw_dict, df_dict, country_name, regions, start_date, end_date, country_column, state_column):
-    query_period = get_period(start_date, end_date, out_date_format='%m-%d-%Y')
-    index_period = get_period(start_date, end_date, out_date_format='%Y-%m-%d')
-
-    for i, date in enumerate(query_period):
-        raw_df = raw_dict[date]
-        country_df = raw_df.loc[raw_df[country_column] == country_name]
-
-        for region in regions:
-            region_df = country_df.loc[country_df[state_column] == region]
-            df_dict[region].loc[index_period[i], 'confirmed'] = region_df['Confirmed'].sum()
-            df_dict[region].loc[index_period[i], 'deaths'] = region_df['Deaths'].sum()
-            df_dict[region].loc[index_period[i], 'recovered'] = region_df['Recovered'].sum(skipna=True)
-            if 'Active' not in raw_df.columns.to_list():
-                df_dict[region].loc[index_period[i], 'active'] = region_df['Confirmed'].sum() \
-                                                                 - region_df['Deaths'].sum() \
-                                                                 - region_df['Recovered'].sum(skipna=True)
-            else:
-                df_dict[region].loc[index_period[i], 'active'] = region_df['Active'].sum(skipna=True)
-
-    return df_dict
-
-
-def get_china_origin_data(data_info):
+def get_china_origin_data(data_info, use_store=False):
     country = Country[data_info.name.upper()]
     regions = load_regions(country)
-    raw_dict = load_raw_data(country)
 
-    df_dict = get_empty_df_dict(data_info)
-    df_dict = get_china_origin_dict(raw_dict, df_dict, 'Mainland China', regions,
-                                    data_info['start_date'], '2020-03-21', 'Country/Region', 'Province/State')
-    df_dict = get_china_origin_dict(raw_dict, df_dict, 'China', regions,
-                                    '2020-03-22', data_info['end_date'], 'Country_Region', 'Province_State')
+    query_period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%m-%d-%Y')
+    index_period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%Y-%m-%d')
+
+    print(f'get China origin data from {index_period[0]} to {index_period[-1]}')
+    raw_df = load_raw_period(country, query_period, index_period, use_store)
+    country_name = np.where(raw_df['date'] < '2020-03-22', 'Mainland China', 'China')
+    raw_df = raw_df.loc[raw_df['Country_Region'] == country_name]
+    raw_df = raw_df.rename(columns=CSSE_ORIGIN_COLUMNS)
+    df_dict = pivot_origin_data(raw_df, regions, index_period)
 
     save_origin_data(country, df_dict)
     return df_dict
 
 
+def get_national_long_df(raw_df, date_column, region_column, confirmed_column, deaths_column, recovered_column):
+    long_df = pd.DataFrame({'date': raw_df[date_column], 'region': raw_df[region_column],
+                            'confirmed': raw_df[confirmed_column].fillna(0),
+                            'deaths': raw_df[deaths_column].fillna(0),
+                            'recovered': raw_df[recovered_column].fillna(0)})
+    long_df['active'] = long_df['confirmed'] - long_df['deaths'] - long_df['recovered']
+    return long_df
+
+
 def get_italy_origin_data(data_info):
     country = Country[data_info.name.upper()]
     regions = load_regions(country)
-    df_dict = get_empty_df_dict(data_info)
-    period = get_period(data_info['start_date'], data_info['end_date'])
+    index_period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%Y-%m-%d')
 
     raw_dict = load_raw_data(country)
     raw_df = raw_dict[next(iter(raw_dict))]
-    raw_df['data'] = pd.to_datetime(raw_df['data'], format='%Y-%m-%dT%H:%M:%S')
-
-    for i, date in enumerate(period):
-        date_dt = datetime.combine(date.date(), datetime.min.time())
-        mask = (raw_df['data'] >= date_dt) & (raw_df['data'] < date_dt + timedelta(days=1))
-        date_df = raw_df.loc[mask]
-        date_str = date.strftime('%Y-%m-%d')
-
-        for region in regions:
-            region_df = date_df.loc[date_df['denominazione_regione'] == region]
-            df_dict[region].loc[date_str, 'confirmed'] = region_df['totale_casi'].sum()
-            df_dict[region].loc[date_str, 'deaths'] = region_df['deceduti'].sum()
-            df_dict[region].loc[date_str, 'recovered'] = region_df['dimessi_guariti'].sum()
-            df_dict[region].loc[date_str, 'active'] = region_df['totale_casi'].sum() \
-                                                      - region_df['deceduti'].sum() \
-                                                      - region_df['dimessi_guariti'].sum()
+    raw_df['data'] = pd.to_datetime(raw_df['data'], format='%Y-%m-%dT%H:%M:%S').dt.strftime('%Y-%m-%d')
+
+    long_df = get_national_long_df(raw_df, 'data', 'denominazione_regione',
+                                   'totale_casi', 'deceduti', 'dimessi_guariti')
+    df_dict = pivot_origin_data(long_df, regions, index_period)
 
     save_origin_data(country, df_dict)
     return df_dict
@@ -234,27 +315,13 @@ def get_italy_origin_data(data_info):
 def get_india_origin_data(data_info):
     country = Country[data_info.name.upper()]
     regions = load_regions(country)
-    df_dict = get_empty_df_dict(data_info)
-    period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%Y-%m-%d')
+    index_period = get_period(data_info['start_date'], data_info['end_date'], out_date_format='%Y-%m-%d')
 
     raw_dict = load_raw_data(country)
     raw_df = raw_dict[next(iter(raw_dict))]
 
-    for date in period:
-        date_df = raw_df.loc[raw_df['Date'] == date]
-
-        for region in regions:
-            region_df = date_df.loc[date_df['State'] == region]
-            if region_df.empty:
-                df_dict[region].loc[date, :] = 0
-                continue
-
-            df_dict[region].loc[date, 'confirmed'] = region_df['Confirmed'].sum()
-            df_dict[region].loc[date, 'deaths'] = region_df['Deceased'].sum()
-            df_dict[region].loc[date, 'recovered'] = region_df['Recovered'].sum()
-            df_dict[region].loc[date, 'active'] = region_df['Confirmed'].sum() \
-                                                  - region_df['Deceased'].sum() \
-                                                  - region_df['Recovered'].sum()
+    long_df = get_national_long_df(raw_df, 'Date', 'State', 'Confirmed', 'Deceased', 'Recovered')
+    df_dict = pivot_origin_data(long_df, regions, index_period)
 
     save_origin_data(country, df_dict)
     return df_dict
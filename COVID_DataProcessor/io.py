@@ -1,17 +1,68 @@
-from COVID_DataProcessor.datatype import Country, PreprocessInfo, get_country_name, PreType
+from COVID_DataProcessor.datatype import Country, PreprocessInfo, DatasetInfo, get_country_name, PreType, DataCube
+from COVID_DataProcessor.datatype import LazyRegionDict
 from COVID_DataProcessor.util import get_period, path_to_name
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import fields
-from os.path import join, abspath, dirname, isfile
+from datetime import datetime
+from functools import partial
+from itertools import repeat
+from os.path import join, abspath, basename, dirname, isfile, getsize, islink, realpath
 from pathlib import Path
 from glob import glob
+from io import StringIO
+from threading import Lock
+from uuid import uuid4
 
 import pandas as pd
+import numpy as np
+import hashlib
+import shutil
+import csv
+import os
+import re
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 ROOT_PATH = Path(abspath(dirname(__file__))).parent
 DATASET_PATH = join(ROOT_PATH, 'dataset')
 SETTING_PATH = join(ROOT_PATH, 'settings')
 RESULT_PATH = join(ROOT_PATH, 'results')
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_MAX_AGE_DAYS = None
+CACHE_DIRECTORIES = ['preprocessed_data', 'sird_data', 'i_data']
+CACHE_ORPHAN_SECONDS = 60 * 60
+ORPHAN_PATTERN = r'\..+\.(tmp|old|link|v)-[0-9a-f]{8}'
+SAVE_MAX_WORKERS = 4
+OUTPUT_FORMAT = 'csv'
+OUTPUT_FORMATS = {'csv': '.csv', 'csv.gz': '.csv.gz', 'parquet': '.parquet'}
+FORMAT_MARKER = '.output_format'
+METADATA_CACHE = dict()
+SETTING_INDEX = dict()
+SETTING_LOCK = Lock()
+SETTING_PRE_TYPES = {'pre_info': PreType.PRE, 'sird_info': PreType.SIRD, 'test_info': PreType.TEST}
+
+
+RAW_SCHEMAS = {
+    Country.US: {'Province_State': None, 'Confirmed': None, 'Deaths': None, 'Recovered': None, 'Active': None,
+                 'People_Tested': 'float64', 'Total_Test_Results': 'float64'},
+    Country.CHINA: {'Province/State': None, 'Province_State': None, 'Country/Region': None, 'Country_Region': None,
+                    'Confirmed': None, 'Deaths': None, 'Recovered': None, 'Active': None},
+    Country.ITALY: {'data': None, 'denominazione_regione': 'category',
+                    'totale_casi': 'Int32', 'deceduti': 'Int32', 'dimessi_guariti': 'Int32', 'casi_testati': 'float64'},
+    Country.INDIA: {'Date': None, 'State': 'category',
+                    'Confirmed': 'Int32', 'Deceased': 'Int32', 'Recovered': 'Int32', 'Tested': 'float64'},
+    Country.US_CONFIRMED: {'Province_State': 'category'},
+}
+
+RAW_STORE_DTYPES = {'Confirmed': 'Int64', 'Deaths': 'Int64', 'Recovered': 'float64', 'Active': 'float64'}
+
+CSSE_COLUMN_NAMES = {'Province/State': 'Province_State', 'Country/Region': 'Country_Region',
+                     'Last Update': 'Last_Update', 'Latitude': 'Lat', 'Longitude': 'Long_'}
 
 
 def get_safe_path(directory_list):
@@ -28,123 +79,398 @@ def get_result_base_path(country):
     return get_safe_path([RESULT_PATH, get_country_name(country)])
 
 
+def read_metadata_csv(file_path, index_col):
+    mtime = os.stat(file_path).st_mtime_ns
+    cached = METADATA_CACHE.get((file_path, index_col))
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, pd.read_csv(file_path, index_col=index_col))
+        METADATA_CACHE.update({(file_path, index_col): cached})
+
+    return cached[1]
+
+
 def load_links(country=None):
     link_path = join(DATASET_PATH, 'links.csv')
-    link_df = pd.read_csv(link_path, index_col='country')
-    return link_df.loc[get_country_name(country), :] if country is not None else link_df
+    link_df = read_metadata_csv(link_path, index_col='country')
+    return link_df.loc[get_country_name(country), :].copy() if country is not None else link_df.copy()
 
 
 def load_population(country, region=None):
-    population_df = pd.read_csv(join(DATASET_PATH, get_country_name(country), 'population.csv'), index_col='regions')
-    return population_df if region is None else population_df.loc[region, 'population']
+    population_df = read_metadata_csv(join(DATASET_PATH, get_country_name(country), 'population.csv'), 'regions')
+    return population_df.copy() if region is None else population_df.loc[region, 'population']
 
 
 def load_regions(country):
-    population_df = load_population(country)
+    population_df = read_metadata_csv(join(DATASET_PATH, get_country_name(country), 'population.csv'), 'regions')
     regions = population_df.index.tolist()
     regions.sort()
     return regions
 
 
-def load_raw_data(country):
+def load_raw_data(country, max_workers=1, use_processes=False, use_store=False):
+    if use_store:
+        store_df = load_raw_store(country, max_workers, use_processes)
+        raw_dict = {date_to_name(date): date_df.drop(columns='date').reset_index(drop=True)
+                    for date, date_df in store_df.groupby('date')}
+        return dict(sorted(raw_dict.items()))
+
     raw_path = join(DATASET_PATH, get_country_name(country))
-    raw_path_list = glob(join(raw_path, 'raw_data', '*.csv'))
+    raw_path_list = sorted(glob(join(raw_path, 'raw_data', '*.csv')))
 
     if len(raw_path_list) == 0:
         print(f'Raw data of {get_country_name(country)} is not existing!')
         raise FileNotFoundError(raw_path)
 
+    return load_raw_files(country, raw_path_list, max_workers, use_processes)
+
+
+def load_raw_files(country, raw_path_list, max_workers=1, use_processes=False):
+    if max_workers == 1:
+        raw_dfs = list(map(load_raw_file, repeat(country), raw_path_list))
+    else:
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        chunksize = max(1, len(raw_path_list) // (max_workers * 4))
+        with executor_class(max_workers=max_workers) as executor:
+            raw_dfs = list(executor.map(load_raw_file, repeat(country), raw_path_list, chunksize=chunksize))
+
     raw_dict = dict()
-    for file_path in raw_path_list:
-        file_name = path_to_name(file_path)
-        raw_df = pd.read_csv(file_path)
-        raw_dict.update({file_name: raw_df})
+    for file_path, raw_df in zip(raw_path_list, raw_dfs):
+        raw_dict.update({path_to_name(file_path): raw_df})
 
     return raw_dict
 
 
-def load_origin_data(country):
+def load_raw_file(country, file_path):
+    raw_df = read_raw_file(country, file_path)
+    if country == Country.CHINA:
+        raw_df = normalize_csse_columns(raw_df)
+    return raw_df
+
+
+def name_to_date(name):
+    return datetime.strptime(name, '%m-%d-%Y').strftime('%Y-%m-%d')
+
+
+def date_to_name(date):
+    return datetime.strptime(date, '%Y-%m-%d').strftime('%m-%d-%Y')
+
+
+def get_raw_store_path(country):
+    return join(DATASET_PATH, get_country_name(country), 'raw_store')
+
+
+def get_raw_store_schema(country):
+    schema = dict()
+    for column, dtype in RAW_SCHEMAS[country].items():
+        column = CSSE_COLUMN_NAMES.get(column, column)
+        schema.update({column: RAW_STORE_DTYPES.get(column, dtype)})
+
+    return schema
+
+
+def ingest_raw_data(country, max_workers=1, use_processes=False, rebuild=False):
+    if country not in [Country.US, Country.CHINA]:
+        raise Exception(f'raw store is only available for daily reports, {country}')
+
+    store_path = get_raw_store_path(country)
+    part_path_list = sorted(glob(join(store_path, '*.parquet')))
+    source_dfs = [load_raw_store_source(part_path) for part_path in part_path_list]
+    if not rebuild and any(source_df is None for source_df in source_dfs):
+        print(f'raw store of {get_country_name(country)} has no source hashes, rebuilding')
+        rebuild = True
+    if rebuild and Path(store_path).is_dir():
+        shutil.rmtree(store_path)
+        part_path_list, source_dfs = [], []
+    store_path = get_safe_path([store_path])
+
+    manifest_df = load_raw_manifest(country)
+    raw_path_list = sorted(glob(join(DATASET_PATH, get_country_name(country), 'raw_data', '*.csv')))
+    raw_names = [path_to_name(path) for path in raw_path_list]
+    sources = {name_to_date(name): get_raw_source(country, name, manifest_df) for name in raw_names}
+
+    stored = set()
+    for source_df in source_dfs:
+        stored |= set(zip(source_df['date'], source_df['source']))
+    raw_path_list = [path for path, name in zip(raw_path_list, raw_names)
+                     if (name_to_date(name), sources[name_to_date(name)]) not in stored]
+    stale_parts = [part_path for part_path, source_df in zip(part_path_list, source_dfs)
+                   if is_raw_store_stale(source_df, sources)]
+    if len(raw_path_list) == 0 and len(stale_parts) == 0:
+        print(f'raw store of {get_country_name(country)} is up to date')
+        return
+
+    if len(raw_path_list) > 0:
+        raw_dict = load_raw_files(country, raw_path_list, max_workers, use_processes)
+        dates = [name_to_date(name) for name in raw_dict.keys()]
+        raw_df = pd.concat(raw_dict.values(), keys=dates, names=['date', None]).reset_index(level='date')
+
+        schema = get_raw_store_schema(country)
+        raw_df = raw_df.reindex(columns=['date'] + list(schema.keys())).reset_index(drop=True)
+        raw_df = raw_df.astype({column: dtype for column, dtype in schema.items() if dtype is not None})
+        raw_df['source'] = raw_df['date'].map(sources)
+
+        part_index = max([int(path_to_name(path, '.parquet').split('-')[-1]) for path in part_path_list], default=-1)
+        part_path = join(store_path, f'part-{part_index + 1:05d}.parquet')
+        write_raw_store_part(raw_df, part_path)
+        print(f'ingesting {len(dates)} {get_country_name(country)} raw files to {part_path}')
+
+    for part_path in stale_parts:
+        part_df = pd.read_parquet(part_path)
+        part_df = part_df.loc[~is_raw_store_stale(part_df, sources, reduce=False)].reset_index(drop=True)
+        if part_df.empty:
+            os.remove(part_path)
+        else:
+            write_raw_store_part(part_df, part_path)
+        print(f'removing re-downloaded {get_country_name(country)} raw files from {part_path}')
+
+
+def load_raw_store_source(part_path):
+    try:
+        return pd.read_parquet(part_path, columns=['date', 'source'])
+    except ValueError:
+        return None
+
+
+def get_raw_source(country, name, manifest_df):
+    if is_raw_file_synced(country, name, manifest_df) and not pd.isna(manifest_df.loc[name, 'hash']):
+        return manifest_df.loc[name, 'hash']
+
+    stat = os.stat(get_raw_file_path(country, name))
+    return f'{stat.st_mtime_ns}-{stat.st_size}'
+
+
+def is_raw_store_stale(source_df, sources, reduce=True):
+    current = source_df['date'].map(sources)
+    stale = current.notna() & (current != source_df['source'])
+    return stale.any() if reduce else stale
+
+
+def write_raw_store_part(part_df, part_path):
+    temp_path = join(dirname(part_path), f'.{basename(part_path)}.tmp-{uuid4().hex[:8]}')
+    part_df.to_parquet(temp_path, index=False)
+    os.replace(temp_path, part_path)
+
+
+def load_raw_store(country, max_workers=1, use_processes=False, columns=None):
+    ingest_raw_data(country, max_workers, use_processes)
+    store_df = pd.read_parquet(get_raw_store_path(country), columns=columns)
+    return store_df if columns is not None else store_df.drop(columns='source')
+
+
+def normalize_csse_columns(raw_df):
+    raw_df = raw_df.rename(columns=CSSE_COLUMN_NAMES)
+    if 'Active' not in raw_df.columns:
+        raw_df['Active'] = raw_df['Confirmed'].fillna(0) - raw_df['Deaths'].fillna(0) - raw_df['Recovered'].fillna(0)
+    return raw_df
+
+
+def get_output_format(output_format=None):
+    output_format = OUTPUT_FORMAT if output_format is None else output_format
+    if output_format not in OUTPUT_FORMATS:
+        raise Exception(f'{output_format} is not a supported output format, choose from {list(OUTPUT_FORMATS)}')
+    return output_format
+
+
+def find_frame_format(file_path, output_format=None):
+    output_format = get_output_format(output_format)
+    for candidate in [output_format, *OUTPUT_FORMATS]:
+        if isfile(file_path + OUTPUT_FORMATS[candidate]):
+            return candidate
+    raise FileNotFoundError(file_path + OUTPUT_FORMATS[output_format])
+
+
+def write_frame(df, file_path, index=True, output_format=None):
+    output_format = get_output_format(output_format)
+    saving_path = write_frame_file(df, file_path, index, output_format)
+    for other_format, extension in OUTPUT_FORMATS.items():
+        if other_format != output_format and isfile(file_path + extension):
+            os.remove(file_path + extension)
+
+    return saving_path
+
+
+def write_frame_file(df, file_path, index, output_format):
+    saving_path = file_path + OUTPUT_FORMATS[output_format]
+    if output_format == 'parquet':
+        df.to_parquet(saving_path, index=index)
+    elif output_format == 'csv.gz':
+        df.to_csv(saving_path, index=index, compression={'method': 'gzip', 'mtime': 0})
+    else:
+        df.to_csv(saving_path, index=index)
+    return saving_path
+
+
+def save_format_marker(base_path, output_format):
+    with open(join(base_path, FORMAT_MARKER), 'w') as f:
+        f.write(output_format)
+
+
+def load_format_marker(base_path):
+    marker_path = join(base_path, FORMAT_MARKER)
+    if not isfile(marker_path):
+        return None
+
+    with open(marker_path) as f:
+        return f.read().strip()
+
+
+def read_frame(file_path, index_col, output_format=None):
+    output_format = load_format_marker(dirname(file_path)) if output_format is None else output_format
+    output_format = find_frame_format(file_path, output_format)
+    if output_format == 'parquet':
+        return pd.read_parquet(file_path + OUTPUT_FORMATS[output_format])
+    return pd.read_csv(file_path + OUTPUT_FORMATS[output_format], index_col=index_col)
+
+
+def glob_frames(base_path):
+    file_path_list = []
+    for extension in OUTPUT_FORMATS.values():
+        file_path_list += glob(join(base_path, f'*{extension}'))
+    return file_path_list
+
+
+def frame_to_name(file_path):
+    file_name = basename(file_path)
+    for extension in sorted(OUTPUT_FORMATS.values(), key=len, reverse=True):
+        if file_name.endswith(extension):
+            return file_name[:-len(extension)]
+    return file_name
+
+
+def is_cube_saved(base_path, typed=False):
+    cube_path = join(base_path, 'cube')
+    return isfile(join(cube_path, 'values.npy')) and (not typed or isfile(join(cube_path, 'dtypes.npy')))
+
+
+def load_cube(base_path, mmap_mode='r'):
+    cube_path = join(base_path, 'cube')
+    values = np.load(join(cube_path, 'values.npy'), mmap_mode=mmap_mode)
+    axes = [np.load(join(cube_path, f'{axis}.npy')).tolist() for axis in ['regions', 'dates', 'metrics']]
+    dtypes = np.load(join(cube_path, 'dtypes.npy')).tolist() if isfile(join(cube_path, 'dtypes.npy')) else None
+    return DataCube(values, *axes, dtypes)
+
+
+def load_origin_data(country, as_array=False):
     origin_path = join(DATASET_PATH, get_country_name(country), 'origin_data')
+    if is_cube_saved(origin_path, typed=not as_array):
+        cube = load_cube(origin_path)
+        return cube if as_array else cube.to_dict()
+
     regions = load_regions(country)
     data_dict = dict()
 
     for region in regions:
-        print(join(origin_path, f'{region}.csv'))
-        region_df = pd.read_csv(join(origin_path, f'{region}.csv'), index_col='date')
+        print(join(origin_path, region))
+        region_df = read_frame(join(origin_path, region), 'date')
         data_dict.update({region: region_df})
 
-    return data_dict
+    return DataCube.from_dict(data_dict) if as_array else data_dict
 
 
 def load_us_confirmed_data():
     origin_path = join(DATASET_PATH, get_country_name(Country.US_CONFIRMED), 'origin_data')
-    saving_path = join(origin_path, 'US_CONFIRMED.csv')
-    us_confirmed_df = pd.read_csv(saving_path, index_col='regions')
+    us_confirmed_df = read_frame(join(origin_path, 'US_CONFIRMED'), 'regions')
     return us_confirmed_df
 
 
 def load_first_confirmed_date(country):
-    first_date_path = join(RESULT_PATH, 'SIRD', get_country_name(country), 'first_confirmed_date.csv')
-    first_confirmed_date_df = pd.read_csv(first_date_path, index_col='regions')
+    first_date_path = join(RESULT_PATH, 'SIRD', get_country_name(country), 'first_confirmed_date')
+    first_confirmed_date_df = read_frame(first_date_path, 'regions')
     return first_confirmed_date_df
 
 
-def load_preprocessed_data(country, pre_info):
+def load_region_file(base_path, region, output_format=None):
+    return read_frame(join(base_path, region), 'date', output_format)
+
+
+def load_preprocessed_data(country, pre_info, as_array=False, lazy=False):
     pre_path = join(DATASET_PATH, get_country_name(country), 'preprocessed_data', pre_info.get_hash())
-    regions = load_regions(country)
-    pre_dict = dict()
+    if is_cube_saved(pre_path, typed=not as_array):
+        cube = load_cube(pre_path)
+        if as_array:
+            return cube
+        return LazyRegionDict(cube.regions, cube.get_region) if lazy else cube.to_dict()
 
-    for region in regions:
-        region_df = pd.read_csv(join(pre_path, f'{region}.csv'), index_col='date')
-        pre_dict.update({region: region_df})
+    regions = load_regions(country)
+    pre_dict = LazyRegionDict(regions, partial(load_region_file, pre_path, output_format=load_format_marker(pre_path)))
+    if lazy and not as_array:
+        return pre_dict
 
-    return pre_dict
+    pre_dict = dict(pre_dict)
+    return DataCube.from_dict(pre_dict) if as_array else pre_dict
 
 
-def load_sird_dict(country, pre_info):
+def load_sird_dict(country, pre_info, as_array=False, lazy=False):
     sird_path = join(DATASET_PATH, get_country_name(country), 'sird_data', pre_info.get_hash())
-    sird_path_list = glob(f'{sird_path}/*.csv')
+    if is_cube_saved(sird_path, typed=not as_array):
+        cube = load_cube(sird_path)
+        if as_array:
+            return cube
+        return LazyRegionDict(cube.regions, cube.get_region) if lazy else cube.to_dict()
+
+    sird_path_list = glob_frames(sird_path)
 
     if len(sird_path_list) == 0:
         print(f'SIRD data of {get_country_name(country)} is not existing!')
         raise FileNotFoundError(sird_path)
 
-    sird_dict = dict()
-    for target_path in sird_path_list:
-        region_name = path_to_name(target_path)
-        sird_df = pd.read_csv(target_path, index_col='date')
-        sird_dict.update({region_name: sird_df})
+    sird_dict = LazyRegionDict([frame_to_name(target_path) for target_path in sird_path_list],
+                               partial(load_region_file, sird_path, output_format=load_format_marker(sird_path)))
+    if lazy and not as_array:
+        return sird_dict
+
+    sird_dict = dict(sird_dict)
+    return DataCube.from_dict(sird_dict) if as_array else sird_dict
 
-    return sird_dict
 
+def load_I_tensor(i_path, mmap_mode='r'):
+    values = np.load(join(i_path, 'I.npy'), mmap_mode=mmap_mode)
+    regions = np.load(join(i_path, 'regions.npy')).tolist()
+    dates = np.load(join(i_path, 'dates.npy')).tolist()
 
-def load_I_df(country, pre_info):
-    i_path = join(DATASET_PATH, get_country_name(country), 'i_data', pre_info.get_hash(), 'I.csv')
-    I_df = pd.read_csv(i_path, index_col='regions')
+    I_df = pd.DataFrame(values, index=regions, columns=dates, copy=False)
+    I_df.index.name = 'regions'
     return I_df
 
 
+def load_I_df(country, pre_info, mmap_mode=None):
+    i_path = join(DATASET_PATH, get_country_name(country), 'i_data', pre_info.get_hash())
+    if mmap_mode is None or not isfile(join(i_path, 'I.npy')):
+        return read_frame(join(i_path, 'I'), 'regions')
+    return load_I_tensor(i_path, mmap_mode)
+
+
+def load_dataset_for_nipa_model(country, sird_info, mmap_mode='r'):
+    i_path = join(RESULT_PATH, 'NIPA', get_country_name(country), 'I', sird_info.get_hash())
+    if mmap_mode is None or not isfile(join(i_path, 'I.npy')):
+        return read_frame(join(i_path, 'I'), 'regions')
+    return load_I_tensor(i_path, mmap_mode)
+
+
+def load_dataset_for_deepnipa(country, sird_info, mmap_mode='r'):
+    sird_path = join(RESULT_PATH, 'DeepNIPA', get_country_name(country), 'sird', sird_info.get_hash())
+    if not is_cube_saved(sird_path):
+        raise FileNotFoundError(join(sird_path, 'cube'))
+    return load_cube(sird_path, mmap_mode)
+
+
 def sird_to_I(country, sird_info):
     regions = load_regions(country)
     link_df = load_links(country)
     dates = get_period(start_date=link_df['start_date'], end_date=link_df['end_date'], out_date_format='%Y-%m-%d')
 
-    I_df = pd.DataFrame(index=regions, columns=dates)
+    sird_cube = load_sird_dict(country, sird_info, as_array=True)
+    I_df = pd.DataFrame(sird_cube.get_metric('infected'), index=sird_cube.regions, columns=sird_cube.dates, dtype=float)
+    I_df = I_df.reindex(index=regions, columns=dates[1:])
     I_df.index.name = 'regions'
-
-    sird_dict = load_sird_dict(country, sird_info)
-    for region, sird_df in sird_dict.items():
-        region_I = sird_df.loc[:, 'infected']
-        I_df.loc[region, :] = region_I
-
-    return I_df.iloc[:, 1:]
+    return I_df
 
 
 def load_r0_df(country, pre_hash, test_hash):
-    r0_path = join(DATASET_PATH, get_country_name(country), 'r0', f'{pre_hash}_{test_hash}', 'r0.csv')
+    r0_path = join(DATASET_PATH, get_country_name(country), 'r0', f'{pre_hash}_{test_hash}', 'r0')
 
     try:
-        r0_df = pd.read_csv(r0_path, index_col='regions')
+        r0_df = read_frame(r0_path, 'regions')
         return r0_df
     except FileNotFoundError as e:
         print(e)
@@ -154,152 +480,542 @@ def load_r0_df(country, pre_hash, test_hash):
 
 def load_test_number(country, test_info):
     test_path = join(RESULT_PATH, get_country_name(country), 'number_of_tests', test_info.get_hash())
-    test_df = pd.read_csv(join(test_path, 'number_of_tests.csv'), index_col='regions')
+    test_df = read_frame(join(test_path, 'number_of_tests'), 'regions')
     return test_df
 
 
+def get_raw_file_path(country, name):
+    return join(DATASET_PATH, get_country_name(country), 'raw_data', f'{name}.csv')
+
+
+def get_file_hash(file_path, chunk_size=1 << 20):
+    file_hash = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def load_raw_manifest(country):
+    manifest_path = join(DATASET_PATH, get_country_name(country), 'raw_manifest.csv')
+    if not isfile(manifest_path):
+        manifest_df = pd.DataFrame(columns=['etag', 'last_modified', 'size', 'hash'])
+        manifest_df.index.name = 'name'
+        return manifest_df
+
+    return pd.read_csv(manifest_path, index_col='name', dtype={'name': str, 'etag': str, 'last_modified': str})
+
+
+def get_manifest_entry(country, name, headers, content_hash):
+    file_path = get_raw_file_path(country, name)
+    return {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified'),
+            'size': getsize(file_path), 'hash': content_hash}
+
+
+def is_raw_file_synced(country, name, manifest_df):
+    file_path = get_raw_file_path(country, name)
+    if name not in manifest_df.index or not isfile(file_path):
+        return False
+
+    return getsize(file_path) == manifest_df.loc[name, 'size']
+
+
+def update_raw_manifest(country, entry_dict):
+    if len(entry_dict) == 0:
+        return
+
+    manifest_df = load_raw_manifest(country)
+    entry_df = pd.DataFrame.from_dict(entry_dict, orient='index')
+    manifest_df = manifest_df.drop(index=entry_df.index, errors='ignore')
+    manifest_df = entry_df if manifest_df.empty else pd.concat([manifest_df, entry_df])
+    manifest_df = manifest_df.sort_index()
+    manifest_df.index.name = 'name'
+
+    manifest_path = join(get_safe_path([DATASET_PATH, get_country_name(country)]), 'raw_manifest.csv')
+    manifest_df.to_csv(manifest_path)
+    print(f'updating raw manifest to {manifest_path}')
+
+
+def is_raw_column(country, column):
+    if country == Country.US_CONFIRMED and re.fullmatch(r'\d+/\d+/\d+', column) is not None:
+        return True
+    return column in RAW_SCHEMAS[country]
+
+
+def get_raw_dtype(country, columns=None):
+    dtype = {column: dtype for column, dtype in RAW_SCHEMAS[country].items() if dtype is not None}
+    return dtype if columns is None else {column: dtype[column] for column in columns if column in dtype}
+
+
+def read_raw_file(country, file_path, chunksize=None):
+    usecols = partial(is_raw_column, country)
+    if chunksize is None:
+        return pd.read_csv(file_path, usecols=usecols, dtype=get_raw_dtype(country))
+
+    reader = pd.read_csv(file_path, usecols=usecols, dtype=get_raw_dtype(country), chunksize=chunksize)
+    raw_df = pd.concat(reader, ignore_index=True)
+    return raw_df.astype(get_raw_dtype(country, raw_df.columns))
+
+
+def save_raw_stream(country, response, name, chunk_size=1 << 20):
+    raw_path = get_safe_path([DATASET_PATH, get_country_name(country), 'raw_data'])
+    file_path = join(raw_path, f'{name}.csv')
+
+    content_hash = hashlib.sha1()
+    with open(f'{file_path}.part', 'wb') as f:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            content_hash.update(chunk)
+            f.write(chunk)
+    os.replace(f'{file_path}.part', file_path)
+
+    print(f'saving raw file to {raw_path}')
+    return file_path, content_hash.hexdigest()
+
+
 def save_raw_file(country, raw_df, name):
     raw_path = get_safe_path([DATASET_PATH, get_country_name(country), 'raw_data'])
     raw_df.to_csv(join(raw_path, f'{name}.csv'), index=False)
     print(f'saving raw file to {raw_path}')
 
 
-def save_dict(base_path, data_dict, data_name):
+def save_region_file(base_path, region, region_df, index, output_format):
+    write_frame_file(region_df, join(base_path, region), index, output_format)
+
+
+def save_dict(base_path, data_dict, data_name, max_workers=SAVE_MAX_WORKERS, output_format=None):
     index = False if data_name == 'raw' else True
+    output_format = get_output_format(output_format)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(save_region_file, repeat(base_path), data_dict.keys(), data_dict.values(),
+                          repeat(index), repeat(output_format)))
+    print(f'saving {len(data_dict)} {data_name} data to {base_path}')
 
-    for region, region_df in data_dict.items():
-        saving_path = join(base_path, f'{region}.csv')
-        region_df.to_csv(saving_path, index=index)
-        print(f'saving {region} {data_name} data to {saving_path}')
+
+def get_temp_path(target_path, suffix='tmp'):
+    parent_path = get_safe_path([dirname(target_path)])
+    return join(parent_path, f'.{basename(target_path)}.{suffix}-{uuid4().hex[:8]}')
+
+
+def publish_directory(temp_path, target_path):
+    version_path = get_temp_path(target_path, 'v')
+    link_path = get_temp_path(target_path, 'link')
+    os.replace(temp_path, version_path)
+    try:
+        os.symlink(basename(version_path), link_path, target_is_directory=True)
+    except OSError:
+        replace_directory(version_path, target_path)
+        return
+
+    previous_path = realpath(target_path) if islink(target_path) else None
+    try:
+        if Path(target_path).is_dir() and not islink(target_path):
+            replace_directory(link_path, target_path)
+        else:
+            os.replace(link_path, target_path)
+    except BaseException:
+        if islink(link_path):
+            os.remove(link_path)
+        if realpath(target_path) != realpath(version_path):
+            shutil.rmtree(version_path, ignore_errors=True)
+        raise
+
+    if previous_path is not None and previous_path != realpath(target_path):
+        shutil.rmtree(previous_path, ignore_errors=True)
+
+
+def replace_directory(source_path, target_path):
+    old_path = get_temp_path(target_path, 'old')
+    try:
+        os.replace(target_path, old_path)
+    except FileNotFoundError:
+        old_path = None
+
+    try:
+        os.replace(source_path, target_path)
+    except OSError:
+        remove_directory(source_path)
+        print(f'{target_path} was published concurrently, discarding {source_path}')
+    finally:
+        if old_path is not None:
+            remove_directory(old_path)
+
+
+def remove_directory(target_path):
+    if islink(target_path):
+        version_path = realpath(target_path)
+        os.remove(target_path)
+        shutil.rmtree(version_path, ignore_errors=True)
+    else:
+        shutil.rmtree(target_path, ignore_errors=True)
+
+
+def publish_dict(target_path, data_dict, data_name, cube=True, output_format=None):
+    temp_path = get_safe_path([get_temp_path(target_path)])
+    try:
+        save_dict(temp_path, data_dict, data_name, output_format=output_format)
+        save_format_marker(temp_path, get_output_format(output_format))
+        if cube:
+            save_cube(temp_path, data_dict)
+        publish_directory(temp_path, target_path)
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+    print(f'publishing {data_name} data to {target_path}')
+
+
+def save_cube(base_path, data_dict):
+    if len(data_dict) == 0:
+        return
+
+    cube = DataCube.from_dict(data_dict)
+    cube_path = get_safe_path([base_path, 'cube'])
+    np.save(join(cube_path, 'values.npy'), cube.values)
+    for axis in ['regions', 'dates', 'metrics', 'dtypes']:
+        np.save(join(cube_path, f'{axis}.npy'), np.array(getattr(cube, axis), dtype=str))
+    print(f'saving cube of {len(cube.regions)} regions to {cube_path}')
 
 
 def save_raw_data(country, raw_dict):
     raw_path = get_safe_path([DATASET_PATH, get_country_name(country), 'raw_data'])
-    save_dict(raw_path, raw_dict, 'raw')
+    save_dict(raw_path, raw_dict, 'raw', output_format='csv')
 
 
-def save_origin_data(country, df_dict):
-    origin_path = get_safe_path([DATASET_PATH, get_country_name(country), 'origin_data'])
-    save_dict(origin_path, df_dict, 'origin')
+def save_origin_data(country, df_dict, output_format=None):
+    origin_path = join(DATASET_PATH, get_country_name(country), 'origin_data')
+    publish_dict(origin_path, df_dict, 'origin', cube=country != Country.US_CONFIRMED, output_format=output_format)
 
 
-def save_preprocessed_dict(country, pre_info, preprocessed_dict, base_path=None):
+def save_preprocessed_dict(country, pre_info, preprocessed_dict, base_path=None, output_format=None):
     if base_path is None:
-        pre_path = get_safe_path([DATASET_PATH, get_country_name(country), 'preprocessed_data', pre_info.get_hash()])
+        pre_path = join(DATASET_PATH, get_country_name(country), 'preprocessed_data', pre_info.get_hash())
     else:
-        pre_path = get_safe_path([base_path, 'preprocessed', pre_info.get_hash()])
-    save_dict(pre_path, preprocessed_dict, 'preprocessed')
+        pre_path = join(base_path, 'preprocessed', pre_info.get_hash())
+    publish_dict(pre_path, preprocessed_dict, 'preprocessed', output_format=output_format)
 
 
-def save_sird_dict(country, sird_info, sird_dict, base_path=None):
+def save_sird_dict(country, sird_info, sird_dict, base_path=None, cube=True, output_format=None):
     if base_path is None:
-        sird_list = [DATASET_PATH, get_country_name(country), 'sird_data', sird_info.get_hash()]
+        sird_path = join(DATASET_PATH, get_country_name(country), 'sird_data', sird_info.get_hash())
     else:
-        sird_list = [base_path, 'sird', sird_info.get_hash()]
-    sird_path = get_safe_path(sird_list)
-    save_dict(sird_path, sird_dict, 'SIRD')
+        sird_path = join(base_path, 'sird', sird_info.get_hash())
+    publish_dict(sird_path, sird_dict, 'SIRD', cube=cube, output_format=output_format)
 
 
-def save_I_df(country, sird_info, I_df):
-    i_path = get_safe_path([DATASET_PATH, get_country_name(country), 'i_data', sird_info.get_hash()])
-    saving_path = join(i_path, 'I.csv')
-    I_df.to_csv(saving_path)
-    print(f'saving I_df to {saving_path}')
+def publish_I_df(i_path, I_df, tensor=True, output_format=None):
+    temp_path = get_safe_path([get_temp_path(i_path)])
+    try:
+        write_frame(I_df, join(temp_path, 'I'), output_format=output_format)
+        save_format_marker(temp_path, get_output_format(output_format))
+        if tensor:
+            np.save(join(temp_path, 'I.npy'), I_df.to_numpy(dtype=float))
+            np.save(join(temp_path, 'regions.npy'), np.array(I_df.index.to_list(), dtype=str))
+            np.save(join(temp_path, 'dates.npy'), np.array(I_df.columns.to_list(), dtype=str))
+        publish_directory(temp_path, i_path)
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+    print(f'saving I_df to {i_path}')
+
 
+def save_I_df(country, sird_info, I_df, output_format=None):
+    i_path = join(DATASET_PATH, get_country_name(country), 'i_data', sird_info.get_hash())
+    publish_I_df(i_path, I_df, output_format=output_format)
 
-def save_sird_initial_info(initial_hash, initial_df, country, region, base_path=None):
+
+def save_sird_initial_info(initial_hash, initial_df, country, region, base_path=None, output_format=None):
     base_path = get_result_base_path(country) if base_path is None else base_path
     initial_path = get_safe_path([base_path, 'initial_values', initial_hash])
-    saving_path = join(initial_path, f'{region}.csv')
-    initial_df.to_csv(saving_path)
+    saving_path = write_frame(initial_df, join(initial_path, region), output_format=output_format)
     print(f'saving {region} initial value to {saving_path}')
 
 
-def save_first_confirmed_date(country, first_confirmed_date_df, base_path=None):
+def save_first_confirmed_date(country, first_confirmed_date_df, base_path=None, output_format=None):
     base_path = get_result_base_path(country) if base_path is None else base_path
-    saving_path = join(base_path, 'first_confirmed_date.csv')
-    first_confirmed_date_df.to_csv(saving_path)
+    saving_path = write_frame(first_confirmed_date_df, join(base_path, 'first_confirmed_date'),
+                              output_format=output_format)
     print(f'saving first confirmed date of {country.name} to {saving_path}')
 
 
-def save_test_number(country, pre_info, test_num_df, base_path=None):
+def save_test_number(country, pre_info, test_num_df, base_path=None, output_format=None):
     base_path = get_result_base_path(country) if base_path is None else base_path
     test_number_path = get_safe_path([base_path, 'number_of_tests', pre_info.get_hash()])
-    saving_path = join(test_number_path, 'number_of_tests.csv')
-    test_num_df.to_csv(saving_path)
+    saving_path = write_frame(test_num_df, join(test_number_path, 'number_of_tests'), output_format=output_format)
     print(f'saving data of number of tests in {country.name} to {saving_path}')
 
 
-def save_dataset_for_r0_model(country, dataset_dict):
+def save_dataset_for_r0_model(country, dataset_dict, output_format=None):
     dataset_path = get_safe_path([RESULT_PATH, 'R0', get_country_name(country)])
     print(f'save dataset for r0 estimating model under {dataset_path}')
-    save_test_number(country, dataset_dict['test_info'], dataset_dict['test_num'], dataset_path)
-    save_preprocessed_dict(country, dataset_dict['pre_info'], dataset_dict['pre_dict'], dataset_path)
-    save_first_confirmed_date(country, dataset_dict['first_confirmed'], dataset_path)
-    dataset_dict['population'].to_csv(join(dataset_path, 'population.csv'))
+    save_test_number(country, dataset_dict['test_info'], dataset_dict['test_num'], dataset_path, output_format)
+    save_preprocessed_dict(country, dataset_dict['pre_info'], dataset_dict['pre_dict'], dataset_path, output_format)
+    save_first_confirmed_date(country, dataset_dict['first_confirmed'], dataset_path, output_format)
+    write_frame(dataset_dict['population'], join(dataset_path, 'population'), output_format=output_format)
 
 
-def save_dataset_for_nipa_model(country, dataset_dict):
+def save_dataset_for_nipa_model(country, dataset_dict, tensor=True, output_format=None):
     dataset_path = get_safe_path([RESULT_PATH, 'NIPA', get_country_name(country)])
     print(f'save dataset for NIPA model under {dataset_path}')
-    dataset_dict['population'].to_csv(join(dataset_path, 'population.csv'))
-    i_path = get_safe_path([dataset_path, 'I', dataset_dict['sird_info'].get_hash()])
-    dataset_dict['i'].to_csv(join(i_path, 'I.csv'))
+    write_frame(dataset_dict['population'], join(dataset_path, 'population'), output_format=output_format)
+    i_path = join(dataset_path, 'I', dataset_dict['sird_info'].get_hash())
+    publish_I_df(i_path, dataset_dict['i'], tensor, output_format)
 
 
-def save_infectious_period(country, period_df, base_path=None):
+def save_infectious_period(country, period_df, base_path=None, output_format=None):
     base_path = get_result_base_path(country) if base_path is None else base_path
-    period_path = join(base_path, 'infectious_period.csv')
-    period_df.to_csv(period_path)
+    period_path = write_frame(period_df, join(base_path, 'infectious_period'), output_format=output_format)
     print(f'saving infectious period to {period_path}')
 
 
-def save_sird_initial_dict(country, initial_dict, pre_info, test_info, base_path):
-    for key, initial_df in initial_dict.items():
-        save_sird_initial_info(f'{pre_info.get_hash()}_{test_info.get_hash()}',
-                               initial_df, country, key, base_path)
+def save_sird_initial_dict(country, initial_dict, pre_info, test_info, base_path, output_format=None):
+    initial_path = join(base_path, 'initial_values', f'{pre_info.get_hash()}_{test_info.get_hash()}')
+    publish_dict(initial_path, initial_dict, 'initial value', cube=False, output_format=output_format)
 
 
-def save_dataset_for_sird_model(country, dataset_dict):
+def save_dataset_for_sird_model(country, dataset_dict, output_format=None):
     dataset_path = get_safe_path([RESULT_PATH, 'SIRD', get_country_name(country)])
     print(f'save dataset for SIRD model under {dataset_path}')
-    save_infectious_period(country, dataset_dict['infectious_period'], dataset_path)
-    dataset_dict['population'].to_csv(join(dataset_path, 'population.csv'))
+    save_infectious_period(country, dataset_dict['infectious_period'], dataset_path, output_format)
+    write_frame(dataset_dict['population'], join(dataset_path, 'population'), output_format=output_format)
     save_sird_initial_dict(country, dataset_dict['initial_dict'],
-                           dataset_dict['pre_info'], dataset_dict['test_info'], dataset_path)
-    save_sird_dict(country, dataset_dict['sird_info'], dataset_dict['sird_dict'], dataset_path)
+                           dataset_dict['pre_info'], dataset_dict['test_info'], dataset_path, output_format)
+    save_sird_dict(country, dataset_dict['sird_info'], dataset_dict['sird_dict'], dataset_path,
+                   output_format=output_format)
 
 
-def save_dataset_for_deepnipa(country, dataset_dict):
+def save_dataset_for_deepnipa(country, dataset_dict, tensor=True, output_format=None):
     dataset_path = get_safe_path([RESULT_PATH, 'DeepNIPA', get_country_name(country)])
     print(f'save dataset for DeepNIPA under {dataset_path}')
-    dataset_dict['population'].to_csv(join(dataset_path, 'population.csv'))
-    save_sird_dict(country, dataset_dict['sird_info'], dataset_dict['sird_dict'], dataset_path)
+    write_frame(dataset_dict['population'], join(dataset_path, 'population'), output_format=output_format)
+    save_sird_dict(country, dataset_dict['sird_info'], dataset_dict['sird_dict'], dataset_path, cube=tensor,
+                   output_format=output_format)
 
 
-def save_setting(param_class, class_name):
-    new_param_dict = dict()
-    new_param_dict.update({'hash': param_class.get_hash()})
+def get_artifact_path(country, directory, info):
+    return join(DATASET_PATH, get_country_name(country), directory, info.get_hash())
 
+
+def get_input_fingerprint(country):
+    country_path = join(DATASET_PATH, get_country_name(country))
+    file_list = sorted(glob_frames(join(country_path, 'origin_data')))
+    file_list += [join(country_path, 'population.csv'), join(country_path, 'raw_manifest.csv'),
+                  join(DATASET_PATH, 'links.csv')]
+
+    fingerprint = hashlib.sha1()
+    for file_path in file_list:
+        if isfile(file_path):
+            fingerprint.update(f'{path_to_name(file_path)}:{get_file_hash(file_path)};'.encode())
+
+    return fingerprint.hexdigest()
+
+
+def is_cache_hit(artifact_path, fingerprint):
+    record_path = join(artifact_path, '.fingerprint')
+    if not isfile(record_path):
+        return False
+
+    with open(record_path) as f:
+        if f.read().strip() != fingerprint:
+            return False
+
+    os.utime(record_path)
+    print(f'cache hit on {artifact_path}')
+    return True
+
+
+def save_cache_record(country, artifact_path, fingerprint):
+    with open(join(get_safe_path([artifact_path]), '.fingerprint'), 'w') as f:
+        f.write(fingerprint)
+    evict_cache(country, keep=artifact_path)
+
+
+def get_cache_df(country=None):
+    country_name = '*' if country is None else get_country_name(country)
+    cache_list = []
+    for directory in CACHE_DIRECTORIES:
+        for artifact_path in glob(join(DATASET_PATH, country_name, directory, '*', '')):
+            artifact_path = abspath(artifact_path)
+            record_path = join(artifact_path, '.fingerprint')
+            if not isfile(record_path):
+                continue
+
+            file_list = [file_path for file_path in Path(artifact_path).rglob('*') if file_path.is_file()]
+            cache_list.append({'path': artifact_path, 'size': sum(getsize(file_path) for file_path in file_list),
+                               'last_used': os.path.getmtime(record_path)})
+
+    cache_df = pd.DataFrame(cache_list, columns=['path', 'size', 'last_used'])
+    return cache_df.sort_values('last_used', ascending=False, ignore_index=True)
+
+
+def get_orphan_paths(country=None):
+    country_name = '*' if country is None else get_country_name(country)
+    parent_list = []
+    for country_path in glob(join(DATASET_PATH, country_name, '')):
+        parent_list += [country_path] + [join(country_path, directory) for directory in CACHE_DIRECTORIES]
+
+    orphan_list = []
+    expired = datetime.now().timestamp() - CACHE_ORPHAN_SECONDS
+    for parent_path in filter(os.path.isdir, parent_list):
+        path_list = [join(parent_path, name) for name in os.listdir(parent_path) if re.fullmatch(ORPHAN_PATTERN, name)]
+        linked = {realpath(join(parent_path, name)) for name in os.listdir(parent_path)
+                  if islink(join(parent_path, name)) and not re.fullmatch(ORPHAN_PATTERN, name)}
+        orphan_list += [path for path in path_list
+                        if (islink(path) or realpath(path) not in linked) and os.lstat(path).st_mtime < expired]
+
+    return orphan_list
+
+
+def evict_cache(country=None, max_bytes=None, max_age_days=None, keep=None):
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_days = CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    cache_df = get_cache_df(country)
+
+    evicted = pd.Series(False, index=cache_df.index)
+    if max_age_days is not None:
+        evicted |= cache_df['last_used'] < datetime.now().timestamp() - max_age_days * 24 * 60 * 60
+    if max_bytes is not None:
+        evicted |= cache_df['size'].cumsum() > max_bytes
+    if keep is not None:
+        evicted &= cache_df['path'] != abspath(keep)
+
+    for artifact_path in cache_df.loc[evicted, 'path']:
+        remove_directory(artifact_path)
+        print(f'evicting cached artifact {artifact_path}')
+
+    for orphan_path in get_orphan_paths(country):
+        if islink(orphan_path):
+            os.remove(orphan_path)
+        else:
+            shutil.rmtree(orphan_path, ignore_errors=True)
+        print(f'removing orphaned directory {orphan_path}')
+
+
+def get_setting_path(class_name):
+    return join(SETTING_PATH, f'{class_name}.csv')
+
+
+def get_setting_row(param_class):
+    setting_row = {'hash': param_class.get_hash()}
     for field in fields(param_class):
         if field.name[0] == '_' or field.name == 'pre_type': continue
-        new_param_dict.update({field.name: getattr(param_class, field.name)})
-
-    param_df = pd.DataFrame(columns=list(new_param_dict.keys()))
-    param_df = param_df.append(new_param_dict, ignore_index=True)
-    param_df = param_df.set_index('hash')
-
-    filename = f'{class_name}.csv'
-    if isfile(join(SETTING_PATH, filename)):
-        df = pd.read_csv(join(SETTING_PATH, filename), index_col='hash')
-        if param_class.get_hash() not in df.index.tolist():
-            df = param_df.append(df, ignore_index=False)
-            df.to_csv(join(SETTING_PATH, filename))
-            print(f'updating settings to {join(SETTING_PATH, filename)}')
-    else:
-        Path(SETTING_PATH).mkdir(parents=True, exist_ok=True)
-        param_df.to_csv(join(SETTING_PATH, filename))
-        print(f'saving settings to {join(SETTING_PATH, filename)}')
+        setting_row.update({field.name: str(getattr(param_class, field.name))})
+    return setting_row
+
+
+def load_setting_index(class_name):
+    file_path = get_setting_path(class_name)
+    if not isfile(file_path):
+        return dict()
+
+    stat = os.stat(file_path)
+    cached = SETTING_INDEX.get(file_path)
+    if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+        setting_df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+        SETTING_INDEX[file_path] = (stat.st_mtime_ns, stat.st_size,
+                                    dict(zip(setting_df['hash'], setting_df.to_dict('records'))))
+    return SETTING_INDEX[file_path][2]
+
+
+def create_setting_file(file_path, text):
+    temp_path = join(SETTING_PATH, f'.{basename(file_path)}.tmp-{uuid4().hex[:8]}')
+    with open(temp_path, 'w') as f:
+        f.write(text)
+
+    try:
+        os.link(temp_path, file_path)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        return create_setting_file_exclusive(file_path, text)
+    finally:
+        os.remove(temp_path)
+
+
+def create_setting_file_exclusive(file_path, text):
+    try:
+        fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+    except FileExistsError:
+        return False
+
+    try:
+        os.write(fd, text.encode())
+        return True
+    finally:
+        os.close(fd)
+
+
+def append_setting_line(file_path, line):
+    fd = os.open(file_path, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, line.encode())
+        return os.fstat(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def lock_setting(class_name):
+    Path(SETTING_PATH).mkdir(parents=True, exist_ok=True)
+    with SETTING_LOCK, open(join(SETTING_PATH, f'.{class_name}.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def save_setting(param_class, class_name):
+    save_setting_row(get_setting_row(param_class), class_name)
+
+
+def get_setting_text(*rows):
+    text = StringIO()
+    csv.writer(text, lineterminator='\n').writerows(rows)
+    return text.getvalue()
+
+
+def save_setting_row(setting_row, class_name):
+    file_path = get_setting_path(class_name)
+    line = get_setting_text(setting_row.values())
+
+    with lock_setting(class_name):
+        setting_index = load_setting_index(class_name)
+        indexed_row = setting_index.get(setting_row['hash'])
+        if indexed_row == setting_row:
+            return
+        if indexed_row is not None:
+            raise ValueError(f'{setting_row["hash"]} is already registered in {file_path} with other settings')
+
+        if create_setting_file(file_path, get_setting_text(setting_row.keys(), setting_row.values())):
+            print(f'saving settings to {file_path}')
+            return
+
+        setting_index = load_setting_index(class_name)
+        cached = SETTING_INDEX[file_path]
+        stat = append_setting_line(file_path, line)
+        if stat.st_size == cached[1] + len(line.encode()):
+            setting_index[setting_row['hash']] = setting_row
+            SETTING_INDEX[file_path] = (stat.st_mtime_ns, stat.st_size, setting_index)
+        print(f'updating settings to {file_path}')
+
+
+def load_setting(class_name, hash_key):
+    setting_index = load_setting_index(class_name)
+    if hash_key not in setting_index:
+        raise KeyError(f'{hash_key} is not registered in {get_setting_path(class_name)}')
+
+    setting_row = setting_index[hash_key]
+    if class_name == 'dataset_info':
+        return DatasetInfo(x_frames=int(setting_row['x_frames']), y_frames=int(setting_row['y_frames']),
+                           test_start=setting_row['test_start'], test_end=setting_row['test_end'])
+    if class_name not in SETTING_PRE_TYPES:
+        raise Exception(f'{class_name} is not a supported setting')
+
+    return PreprocessInfo(country=Country[setting_row['country'].split('.')[-1]],
+                          start=setting_row['start'], end=setting_row['end'],
+                          increase=setting_row['increase'] == 'True', daily=setting_row['daily'] == 'True',
+                          remove_zero=setting_row['remove_zero'] == 'True',
+                          smoothing=setting_row['smoothing'] == 'True', window=int(setting_row['window']),
+                          divide=setting_row['divide'] == 'True', pre_type=SETTING_PRE_TYPES[class_name])
 
 
 if __name__ == '__main__':
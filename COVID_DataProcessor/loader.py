@@ -1,5 +1,5 @@
 from COVID_DataProcessor.datatype import Country, PreprocessInfo, DatasetInfo, PreType
-from COVID_DataProcessor.io import load_links, load_I_df
+from COVID_DataProcessor.io import load_links, load_I_df, save_setting
 
 from datetime import timedelta
 
@@ -20,7 +20,7 @@ class I_Loader:
         self.start = (self.test_start + timedelta(days=-self.x_frames)).strftime('%Y-%m-%d')
         self.end = (self.test_end + timedelta(days=self.y_frames-1)).strftime('%Y-%m-%d')
         self.I_df = I_df.loc[:, self.start:self.end]
-        self.len = len(self.I_df.columns.to_list())
+        self.len = self.I_df.shape[1]
 
     def __getitem__(self, idx):
         idx += self.x_frames
@@ -41,6 +41,7 @@ if __name__ == '__main__':
                               smoothing=True, window=5, divide=True, pre_type=PreType.SIRD)
     data_info = DatasetInfo(x_frames=15, y_frames=3,
                             test_start='201230', test_end='210306')
+    save_setting(data_info, 'dataset_info')
 
-    I_df = load_I_df(country, sird_info)
+    I_df = load_I_df(country, sird_info, mmap_mode='r')
     loader = I_Loader(I_df, data_info)
@@ -3,14 +3,14 @@ from COVID_DataProcessor.io import load_population, save_dataset_for_deepnipa, l
 from COVID_DataProcessor.preprocess.preprocess import get_sird_dict
 
 
-def get_dataset_for_deepnipa(country, sird_info):
+def get_dataset_for_deepnipa(country, sird_info, tensor=True):
     population_df = load_population(country)
     sird_dict = get_sird_dict(country, sird_info)
 
     dataset_dict = {'population': population_df,
                     'sird_info': sird_info,
                     'sird_dict': sird_dict}
-    save_dataset_for_deepnipa(country, dataset_dict)
+    save_dataset_for_deepnipa(country, dataset_dict, tensor)
     return dataset_dict
 
 
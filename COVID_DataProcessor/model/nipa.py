@@ -1,19 +1,36 @@
 from COVID_DataProcessor.datatype import Country, PreType, PreprocessInfo
 from COVID_DataProcessor.io import load_population, sird_to_I, save_dataset_for_nipa_model, load_links
+from COVID_DataProcessor.io import load_I_df, save_I_df
+from COVID_DataProcessor.io import get_input_fingerprint, get_artifact_path, is_cache_hit, save_cache_record
+from COVID_DataProcessor.preprocess.preprocess import get_sird_dict
 
 
-def get_dataset_for_sird_model(country, sird_info):
+def get_dataset_for_sird_model(country, sird_info, tensor=True):
     population_df = load_population(country)
-    I_df = sird_to_I(country, sird_info)
+    I_df = get_I_df(country, sird_info)
 
     dataset_dict = {'population': population_df,
                     'sird_info': sird_info,
                     'i': I_df}
 
-    save_dataset_for_nipa_model(country, dataset_dict)
+    save_dataset_for_nipa_model(country, dataset_dict, tensor)
     return dataset_dict
 
 
+def get_I_df(country, sird_info):
+    fingerprint = get_input_fingerprint(country)
+    i_path = get_artifact_path(country, 'i_data', sird_info)
+    if is_cache_hit(i_path, fingerprint):
+        return load_I_df(country, sird_info, mmap_mode='c')
+
+    get_sird_dict(country, sird_info, fingerprint)
+    I_df = sird_to_I(country, sird_info)
+    save_I_df(country, sird_info, I_df)
+    save_cache_record(country, i_path, fingerprint)
+
+    return I_df
+
+
 if __name__ == '__main__':
     country = Country.ITALY
     link_df = load_links(country)
@@ -27,7 +27,7 @@ def get_dataset_for_sird_model(country, pre_info, test_info):
 
 def get_initial_dict(country, pre_info, test_info):
     r0_df = load_r0_df(country, pre_info.get_hash(), test_info.get_hash())
-    pre_dict = load_preprocessed_data(country, pre_info)
+    pre_dict = load_preprocessed_data(country, pre_info, lazy=True)
     population_df = load_population(country)
 
     common_dates = get_common_dates_between_dict_and_df(pre_dict, r0_df)
@@ -38,7 +38,7 @@ def get_initial_dict(country, pre_info, test_info):
     initial_dict = dict()
 
     for region in regions:
-        if region not in r0_df.index.tolist():
+        if region not in r0_df.index:
             continue
 
         region_df = pd.DataFrame(index=common_dates, columns=['r0', 'mortality_rate'])
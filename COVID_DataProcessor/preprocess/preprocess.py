@@ -1,38 +1,162 @@
-from COVID_DataProcessor.datatype import Country, PreprocessInfo, PreType
+from COVID_DataProcessor.datatype import Country, PreprocessInfo, PreType, DataCube
 from COVID_DataProcessor.io import load_links, load_population, load_origin_data
+from COVID_DataProcessor.io import load_preprocessed_data, load_sird_dict
 from COVID_DataProcessor.io import save_preprocessed_dict, save_setting, save_sird_dict
+from COVID_DataProcessor.io import get_input_fingerprint, get_artifact_path, is_cache_hit, save_cache_record
 from COVID_DataProcessor.util import get_period, generate_dataframe
 from datetime import datetime, timedelta
 from copy import copy
 
 import pandas as pd
 import numpy as np
+import operator
 
+SMOOTHING_METHODS = ('centered', 'trailing', 'ewma')
 
-def get_sird_dict(country, sird_info):
+
+def get_sird_dict(country, sird_info, fingerprint=None):
     save_setting(sird_info, 'sird_info')
 
-    origin_dict = load_origin_data(country)
-    preprocessed_dict = preprocess_origin_dict(country, origin_dict, sird_info)
+    fingerprint = get_input_fingerprint(country) if fingerprint is None else fingerprint
+    sird_path = get_artifact_path(country, 'sird_data', sird_info)
+    if is_cache_hit(sird_path, fingerprint):
+        return load_sird_dict(country, sird_info)
+
+    preprocessed_dict = get_preprocessed_dict(country, sird_info, fingerprint)
     sird_dict = convert_columns_to_sird(country, preprocessed_dict, sird_info)
-    save_sird_dict(country, sird_info, sird_dict)
+    save_cache_record(country, sird_path, fingerprint)
 
     return sird_dict
 
 
+def get_preprocessed_dict(country, pre_info, fingerprint=None):
+    fingerprint = get_input_fingerprint(country) if fingerprint is None else fingerprint
+    pre_path = get_artifact_path(country, 'preprocessed_data', pre_info)
+    if is_cache_hit(pre_path, fingerprint):
+        return load_preprocessed_data(country, pre_info)
+
+    origin_dict = load_origin_data(country)
+    preprocessed_dict = preprocess_origin_dict(country, origin_dict, pre_info)
+    save_cache_record(country, pre_path, fingerprint)
+
+    return preprocessed_dict
+
+
 def preprocess_origin_dict(country, data_dict, pre_info):
     save_setting(pre_info, 'pre_info')
-    preprocessed_dict = dict()
-
-    for region, region_df in data_dict.items():
-        preprocessed_df = preprocess(region_df, load_population(country, region), pre_info)
-        preprocessed_dict.update({region: preprocessed_df})
+    population_df = load_population(country)
+    populations = population_df.loc[list(data_dict.keys()), 'population'].to_numpy()
 
+    preprocessed_dict = preprocess_dict(data_dict, populations, pre_info)
     save_preprocessed_dict(country, pre_info, preprocessed_dict)
     return preprocessed_dict
 
 
-def preprocess(parsed_df, population, pre_info, targets=None):
+def preprocess_dict(data_dict, populations, pre_info, method='centered'):
+    if pre_info.pre_type == PreType.TEST or len(data_dict) == 0:
+        return {region: preprocess(region_df, population, pre_info, method=method)
+                for (region, region_df), population in zip(data_dict.items(), populations)}
+
+    cube = DataCube.from_dict(data_dict)
+    integer = get_integer_mask(cube)
+
+    values, dates = preprocess_values(cube.values, cube.metrics, cube.dates, populations, pre_info, integer,
+                                      method=method)
+    return DataCube(values, cube.regions, dates, cube.metrics, get_restored_dtypes(cube, integer)).to_dict()
+
+
+def get_preprocessed_dict_windows(country, pre_info, windows, method='centered'):
+    origin_dict = load_origin_data(country)
+    population_df = load_population(country)
+    populations = population_df.loc[list(origin_dict.keys()), 'population'].to_numpy()
+
+    return preprocess_dict_windows(origin_dict, populations, pre_info, windows, method)
+
+
+def preprocess_dict_windows(data_dict, populations, pre_info, windows, method='centered'):
+    if pre_info.pre_type == PreType.TEST or len(data_dict) == 0:
+        window_dicts = dict()
+        for window in windows:
+            window_info = copy(pre_info)
+            window_info.smoothing, window_info.window = True, window
+            window_dicts.update({window: preprocess_dict(data_dict, populations, window_info, method)})
+        return window_dicts
+
+    cube = DataCube.from_dict(data_dict)
+    integer = get_integer_mask(cube)
+
+    values, dates, targets = preprocess_cumulated_values(cube.values, cube.metrics, cube.dates, pre_info, integer)
+    targets = ['confirmed', 'deaths', 'recovered', 'active'] if targets is None else targets
+    target_indices = [cube.metrics.index(target) for target in targets]
+    integer[:, target_indices] = False
+
+    target_values = np.moveaxis(values[:, :, target_indices], 1, 2)
+    smoothed_values = get_smoothed_values(target_values, windows, method)
+
+    window_dicts = dict()
+    for window in windows:
+        window_values = values.copy()
+        window_values[:, :, target_indices] = np.moveaxis(smoothed_values[window], 2, 1)
+        window_integer = integer.copy()
+        if pre_info.divide:
+            window_values /= np.asarray(populations)[:, np.newaxis, np.newaxis]
+            window_integer[:] = False
+
+        window_cube = DataCube(window_values, cube.regions, dates, cube.metrics,
+                               get_restored_dtypes(cube, window_integer))
+        window_dicts.update({window: window_cube.to_dict()})
+
+    return window_dicts
+
+
+def get_integer_mask(cube):
+    return np.array([[pd.api.types.is_integer_dtype(dtype) for dtype in row] for row in cube.dtypes], ndmin=2)
+
+
+def get_restored_dtypes(cube, integer):
+    return [[dtype if integer[i, j] else 'float64' for j, dtype in enumerate(row)] for i, row in enumerate(cube.dtypes)]
+
+
+def preprocess_values(values, metrics, dates, populations, pre_info, integer, targets=None, method='centered'):
+    values, dates, targets = preprocess_cumulated_values(values, metrics, dates, pre_info, integer, targets)
+    if pre_info.smoothing:
+        targets = ['confirmed', 'deaths', 'recovered', 'active'] if targets is None else targets
+        for target in targets:
+            m = metrics.index(target)
+            if method == 'centered':
+                values[:, :, m] = [smooth(row, pre_info.window) for row in values[:, :, m]]
+            else:
+                values[:, :, m] = get_smoothed_values(values[:, :, m], [pre_info.window], method)[pre_info.window]
+            integer[:, m] = False
+    if pre_info.divide:
+        values /= np.asarray(populations)[:, np.newaxis, np.newaxis]
+        integer[:] = False
+
+    return values, dates
+
+
+def preprocess_cumulated_values(values, metrics, dates, pre_info, integer, targets=None):
+    if pre_info.increase:
+        targets = ['confirmed', 'deaths', 'recovered'] if targets is None else targets
+        for target in targets:
+            m = metrics.index(target)
+            integer[:, m] &= ~increase_values(values[:, :, m])
+    if pre_info.daily:
+        targets = ['confirmed', 'deaths', 'recovered'] if targets is None else targets
+        for target in targets:
+            m = metrics.index(target)
+            values[:, 1:, m] = get_daily_values(values[:, :, m])
+        values, dates = values[:, 1:, :], dates[1:]
+    if pre_info.remove_zero:
+        targets = ['recovered'] if targets is None else targets
+        for target in targets:
+            m = metrics.index(target)
+            integer[:, m] &= ~remove_zero_values(values[:, :, m])
+
+    return values, dates, targets
+
+
+def preprocess(parsed_df, population, pre_info, targets=None, method='centered'):
     if pre_info.increase:
         targets = ['confirmed', 'deaths', 'recovered'] if targets is None else targets
         parsed_df = dataset_to_increased(parsed_df, targets=targets)
@@ -44,7 +168,7 @@ def preprocess(parsed_df, population, pre_info, targets=None):
         parsed_df = remove_zero_period(parsed_df, targets=targets)
     if pre_info.smoothing:
         targets = ['confirmed', 'deaths', 'recovered', 'active'] if targets is None else targets
-        parsed_df = apply_moving_average(parsed_df, targets=targets, window=pre_info.window)
+        parsed_df = apply_moving_average(parsed_df, targets=targets, window=pre_info.window, method=method)
     if pre_info.divide:
         parsed_df = divide_by_population(parsed_df, population)
 
@@ -56,6 +180,7 @@ def preprocess(parsed_df, population, pre_info, targets=None):
 
 def convert_columns_to_sird(country, dataset_dict, sird_info):
     new_columns = ['date', 'susceptible', 'infected', 'recovered', 'deceased']
+    population_df = load_population(country)
     sird_dict = dict()
 
     for region, dataset in dataset_dict.items():
@@ -66,7 +191,7 @@ def convert_columns_to_sird(country, dataset_dict, sird_info):
         recovered = dataset['recovered'].to_numpy()
         deceased = dataset['deaths'].to_numpy()
 
-        population = load_population(country, region)
+        population = population_df.loc[region, 'population']
         if sird_info.divide is False:
             susceptible = np.full(infected.shape, population) - infected - recovered - deceased
         else:
@@ -89,29 +214,33 @@ def convert_columns_to_sird(country, dataset_dict, sird_info):
 
 def dataset_to_increased(target_df, targets):
     preprocessed_df = target_df.copy(deep=True)
+    increased_values, interpolated = get_increased_values(target_df[targets].to_numpy(dtype=float).T)
 
-    for target in targets:
-        target_values = target_df[target].to_list()
-        new_values = target_to_increased(target_values)
-        preprocessed_df[target] = new_values
+    for i, target in enumerate(targets):
+        if interpolated[i]:
+            preprocessed_df[target] = increased_values[i]
+        else:
+            preprocessed_df[target] = increased_values[i].astype(target_df[target].dtype)
 
     return preprocessed_df
 
 
 def cumulated_to_daily(target_df, targets):
-    preprocessed_df = target_df.copy(deep=True)
-    new_index = preprocessed_df.index[1:]
+    preprocessed_df = target_df.iloc[1:].copy(deep=True)
+    daily_values = get_daily_values(target_df[targets].to_numpy(dtype=float).T)
 
-    for target in targets:
-        target_values = preprocessed_df[target].to_list()
-        daily_values = target_to_daily(target_values)
-        preprocessed_df.loc[new_index, target] = daily_values
+    for i, target in enumerate(targets):
+        preprocessed_df[target] = daily_values[i].astype(target_df[target].dtype)
 
-    return preprocessed_df.loc[new_index, :]
+    return preprocessed_df
 
 
-def apply_moving_average(target_df, targets, window):
+def apply_moving_average(target_df, targets, window, method='centered'):
     preprocessed_df = target_df.copy(deep=True)
+    if method != 'centered':
+        smoothed_values = get_smoothed_values(target_df[targets].to_numpy(dtype=float).T, [window], method)[window]
+        preprocessed_df[targets] = smoothed_values.T
+        return preprocessed_df
 
     for target in targets:
         target_values = preprocessed_df[target].to_list()
@@ -123,36 +252,64 @@ def apply_moving_average(target_df, targets, window):
 
 def remove_zero_period(target_df, targets):
     preprocessed_df = target_df.copy(deep=True)
+    removed_values, interpolated = get_zero_removed_values(target_df[targets].to_numpy(dtype=float).T)
 
-    for target in targets:
-        target_values = preprocessed_df[target].to_list()
-        daily_values = make_zero_and_negative_removed(target_values)
-        preprocessed_df.loc[:, target] = daily_values
+    for i, target in enumerate(targets):
+        if interpolated[i]:
+            preprocessed_df[target] = removed_values[i]
+        else:
+            preprocessed_df[target] = removed_values[i].astype(target_df[target].dtype)
 
     return preprocessed_df
 
 
 def make_zero_and_negative_removed(target_values):
-    target_values = copy(target_values)
+    removed_values, _ = get_zero_removed_values([target_values])
+    return removed_values[0].tolist()
 
-    for i, value in enumerate(target_values):
-        if i == 0: continue
-        if target_values[i-1] <= 0 or value > 0: continue
 
-        max_index = get_nonzero_index(target_values, i)
-        target_values = interpolate(target_values, i - 1, max_index)
+def get_zero_removed_values(values):
+    removed_values = np.array(values, dtype=float, ndmin=2)
+    return removed_values, remove_zero_values(removed_values)
 
-    return target_values
 
+def remove_zero_values(values):
+    n_rows, n_dates = values.shape
+    interpolated = np.zeros(n_rows, dtype=bool)
+    flattened = np.zeros(n_rows, dtype=bool)
+    gaps = ~(values > 0)
 
-def get_nonzero_index(region_values, broken_index):
-    index = broken_index + 1
-    while index < len(region_values):
-        if region_values[index] > 0:
-            return index
-        index += 1
+    for i in np.flatnonzero(np.any(gaps[:, 1:], axis=0)) + 1:
+        rows = np.flatnonzero(gaps[:, i] & ~(values[:, i - 1] <= 0) & ~flattened)
+        if len(rows) == 0: continue
 
-    return -1
+        end_index = np.full(len(rows), -1)
+        if i + 1 < n_dates:
+            end_index[values[rows, i + 1] > 0] = i + 1
+        for j in np.flatnonzero(end_index == -1):
+            end_index[j] = get_first_index(values[rows[j]], i + 1, operator.gt, 0)
+
+        tail = end_index == -1
+        fill_segments(values, rows[~tail], i - 1, end_index[~tail] - i + 1)
+        interpolated[rows[~tail]] = True
+
+        tail_rows = rows[tail]
+        values[tail_rows, i - 1:] = values[tail_rows, i - 1:i]
+        interpolated[tail_rows] |= (values[tail_rows, i - 1] > 0) & (i + 2 < n_dates)
+        flattened[tail_rows] = True
+
+    return interpolated
+
+
+def fill_segments(values, rows, start_index, steps, theta=None):
+    start_index = np.broadcast_to(start_index, rows.shape)
+    if theta is None:
+        theta = (values[rows, start_index + steps] - values[rows, start_index]) / steps
+
+    offsets = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps) + 1
+    segment_rows, segment_starts = np.repeat(rows, steps), np.repeat(start_index, steps)
+    segment_values = values[segment_rows, segment_starts] + np.repeat(theta, steps) * offsets
+    values[segment_rows, segment_starts + offsets] = segment_values
 
 
 def divide_by_population(target_df, population):
@@ -177,61 +334,162 @@ def smooth(array, size):
     return np.concatenate((start, out, stop))
 
 
+def get_smoothed_values(values, windows, method='centered'):
+    values = np.array(values, dtype=float, ndmin=2)
+    if method not in SMOOTHING_METHODS:
+        raise Exception(f'unsupported smoothing method: {method}, expected one of {SMOOTHING_METHODS}')
+    if method == 'ewma':
+        return {window: get_ewma_values(values, window) for window in windows}
+
+    missing = np.isnan(values)
+    cumulated = get_cumulated_values(np.where(missing, 0, values))
+    missing_counts = get_cumulated_values(missing) if missing.any() else None
+
+    smoothed_values = dict()
+    for window in windows:
+        if method == 'centered':
+            smoothed = get_centered_values(values, cumulated, missing_counts, window)
+        else:
+            smoothed = get_trailing_values(values, cumulated, missing_counts, window)
+        smoothed_values.update({window: smoothed})
+
+    return smoothed_values
+
+
+def get_cumulated_values(values):
+    zeros = np.zeros(values.shape[:-1] + (1,))
+    return np.concatenate((zeros, np.cumsum(values, axis=-1)), axis=-1)
+
+
+def get_window_sums(cumulated, missing_counts, starts, stops):
+    window_sums = cumulated[..., stops] - cumulated[..., starts]
+    if missing_counts is not None:
+        window_sums[missing_counts[..., stops] > missing_counts[..., starts]] = np.nan
+    return window_sums
+
+
+def get_centered_values(values, cumulated, missing_counts, window):
+    n_dates = values.shape[-1]
+    if window % 2 == 0 or window > n_dates:
+        raise Exception(f'centered window must be odd and at most {n_dates}, got {window}')
+
+    out = get_window_sums(cumulated, missing_counts, slice(0, n_dates - window + 1), slice(window, None)) / window
+    r = np.arange(1, window - 1, 2)
+    # same edges as smooth(): the start edge averages every other value of the first window
+    start = np.cumsum(values[..., :window - 1:2], axis=-1) / r
+    stop = (get_window_sums(cumulated, missing_counts, n_dates - r, np.full(len(r), n_dates)) / r)[..., ::-1]
+    return np.concatenate((start, out, stop), axis=-1)
+
+
+def get_trailing_values(values, cumulated, missing_counts, window):
+    if window < 1:
+        raise Exception(f'trailing window must be positive, got {window}')
+
+    stops = np.arange(1, values.shape[-1] + 1)
+    starts = np.maximum(stops - window, 0)
+    return get_window_sums(cumulated, missing_counts, starts, stops) / (stops - starts)
+
+
+def get_ewma_values(values, window):
+    if window < 1:
+        raise Exception(f'ewma window must be positive, got {window}')
+
+    alpha = 2 / (window + 1)
+    ewma_values = values.copy()
+    for i in range(1, values.shape[-1]):
+        previous, current = ewma_values[..., i - 1], values[..., i]
+        updated = np.where(np.isnan(previous), current, alpha * current + (1 - alpha) * previous)
+        ewma_values[..., i] = np.where(np.isnan(current), previous, updated)
+    return ewma_values
+
+
 def target_to_increased(target_values):
-    for i in range(1, len(target_values)):
-        if target_values[i] - target_values[i - 1] < 0:
-            max_index = get_max_index(target_values, i)
-            target_values = interpolate(target_values, i - 1, max_index)
+    increased_values, _ = get_increased_values([target_values])
+    return increased_values[0].tolist()
 
-    return target_values
 
+def get_increased_values(values):
+    increased_values = np.array(values, dtype=float, ndmin=2)
+    return increased_values, increase_values(increased_values)
 
-def target_to_daily(target_values):
-    daily_values = []
-
-    zero_ended = False
-    for i in range(len(target_values) - 1):
-        if zero_ended is False and target_values[i] != 0:
-            zero_ended = True
-            daily_values.append(0)
-        elif zero_ended is False and target_values[i] == 0:
-            daily_values.append(target_values[i])
+
+def increase_values(values):
+    n_rows, n_dates = values.shape
+    interpolated = np.zeros(n_rows, dtype=bool)
+    start_index = np.full(n_rows, -1)
+    segments = []
+
+    dip_dates = np.flatnonzero(np.any(np.diff(values, axis=1) < 0, axis=0)) + 1
+    i = dip_dates[0] if len(dip_dates) > 0 else n_dates
+    while i < n_dates:
+        pending = np.flatnonzero(start_index >= 0)
+        checking = np.flatnonzero(start_index < 0)
+
+        resolved = pending[values[pending, i] >= values[pending, start_index[pending]]]
+        if len(resolved) > 0:
+            steps = i - start_index[resolved]
+            theta = (values[resolved, i] - values[resolved, start_index[resolved]]) / steps
+            values[resolved, i] = values[resolved, start_index[resolved]] + theta * steps
+            segments.append((resolved, start_index[resolved], steps, theta))
+            start_index[resolved] = -1
+            interpolated[resolved] = True
+
+        broken = checking[values[checking, i] - values[checking, i - 1] < 0]
+        start_index[broken] = i - 1
+
+        if len(resolved) > 0 or np.any(start_index >= 0):
+            i += 1
         else:
-            daily_values.append(target_values[i + 1] - target_values[i])
+            next_dip = np.searchsorted(dip_dates, i + 1)
+            i = dip_dates[next_dip] if next_dip < len(dip_dates) else n_dates
 
-    return daily_values
+    for rows, starts, steps, theta in segments:
+        fill_segments(values, rows, starts, steps, theta)
+
+    tail_rows = np.flatnonzero(start_index >= 0)
+    tail = np.arange(n_dates) >= start_index[tail_rows, np.newaxis]
+    values[tail_rows] = np.where(tail, values[tail_rows, start_index[tail_rows]][:, np.newaxis], values[tail_rows])
 
+    return interpolated
 
-def get_max_index(region_values, broken_index):
-    start_value = region_values[broken_index - 1]
 
-    index = broken_index + 1
-    while index < len(region_values):
-        if start_value <= region_values[index]:
+def get_first_index(values, start_index, compare, threshold):
+    for index in range(start_index, min(start_index + 4, len(values))):
+        if compare(values[index], threshold):
             return index
-        index += 1
+
+    start_index, window = start_index + 4, 16
+    while start_index < len(values):
+        found = np.flatnonzero(compare(values[start_index:start_index + window], threshold))
+        if len(found) > 0:
+            return start_index + found[0]
+        start_index += window
+        window *= 2
 
     return -1
 
 
-def interpolate(region_values, start_index, end_index):
-    region_values = copy(region_values)
+def target_to_daily(target_values):
+    return get_daily_values(target_values)[0].tolist()
+
 
-    if end_index == -1:
-        tail_len = len(region_values[start_index:])
-        tail = [region_values[start_index] for i in range(tail_len)]
-        region_values[start_index:] = tail
-        return region_values
+def get_daily_values(values):
+    values = np.atleast_2d(values)
+    if values.shape[1] < 2:
+        return values[:, :0].copy()
 
-    step = end_index - start_index
-    theta = (region_values[end_index] - region_values[start_index]) / step
+    first_index = get_first_nonzero_index(values[:, :-1])
+    leading = np.arange(values.shape[1] - 1) < first_index[:, np.newaxis]
+    daily_values = np.where(leading, values[:, :-1], np.diff(values, axis=1))
+
+    started = np.flatnonzero(first_index < values.shape[1] - 1)
+    daily_values[started, first_index[started]] = 0
+    return daily_values
 
-    step = 1
-    for i in range(start_index + 1, end_index + 1):
-        region_values[i] = region_values[start_index] + (theta * step)
-        step += 1
 
-    return region_values
+def get_first_nonzero_index(values):
+    nonzero = values != 0
+    return np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), values.shape[1])
 
 
 def cut_first_zeros(target_df):
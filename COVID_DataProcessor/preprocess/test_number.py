@@ -7,11 +7,11 @@ from datetime import datetime, timedelta
 import pandas as pd
 
 
-def get_test_number(country, test_info):
+def get_test_number(country, test_info, use_store=False):
     save_setting(test_info, 'test_info')
 
     if country == Country.US:
-        test_num_df = get_test_number_of_us(country, test_info)
+        test_num_df = get_test_number_of_us(country, test_info, use_store)
     elif country == Country.ITALY:
         test_num_df = get_test_number_of_italy(country, test_info)
     elif country == Country.INDIA:
@@ -29,8 +29,8 @@ def preprocess_test_number(test_num_df, test_info):
     return preprocessed_df
 
 
-def get_test_number_of_us(country, test_info):
-    raw_dict = load_raw_data(country)
+def get_test_number_of_us(country, test_info, use_store=False):
+    raw_dict = load_raw_data(country, use_store=use_store)
 
     regions = load_regions(country)
     period = get_period(test_info.start, test_info.end, out_date_format='%Y-%m-%d')
@@ -0,0 +1,18 @@
+from COVID_DataProcessor import io
+from os.path import join
+
+import pytest
+import shutil
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    dataset_path = tmp_path / 'dataset'
+    (dataset_path / 'Italy').mkdir(parents=True)
+    shutil.copy(join(io.DATASET_PATH, 'links.csv'), dataset_path / 'links.csv')
+    shutil.copy(join(io.DATASET_PATH, 'Italy', 'population.csv'), dataset_path / 'Italy' / 'population.csv')
+
+    monkeypatch.setattr(io, 'DATASET_PATH', str(dataset_path))
+    monkeypatch.setattr(io, 'RESULT_PATH', str(tmp_path / 'results'))
+    monkeypatch.setattr(io, 'SETTING_PATH', str(tmp_path / 'settings'))
+    return tmp_path
@@ -0,0 +1,85 @@
+from COVID_DataProcessor import io
+from COVID_DataProcessor.datatype import Country, PreprocessInfo, PreType
+from COVID_DataProcessor.io import evict_cache, load_regions, save_origin_data
+from COVID_DataProcessor.model import nipa
+from COVID_DataProcessor.preprocess import preprocess
+from os.path import join, exists
+from time import time
+
+from tests.test_cube import make_origin_dict
+import pandas as pd
+import os
+
+
+def make_artifact(*directories, size=1000, fingerprint=True):
+    artifact_path = join(io.DATASET_PATH, *directories)
+    os.makedirs(artifact_path)
+    with open(join(artifact_path, 'data.csv'), 'w') as f:
+        f.write('0' * size)
+    if fingerprint:
+        with open(join(artifact_path, '.fingerprint'), 'w') as f:
+            f.write('fingerprint')
+    return artifact_path
+
+
+def test_eviction_skips_unrecorded_and_other_countries(data_root):
+    legacy_path = make_artifact('Italy', 'preprocessed_data', 'legacy', fingerprint=False)
+    old_path = make_artifact('Italy', 'preprocessed_data', 'old')
+    os.utime(join(old_path, '.fingerprint'), (time() - 60, time() - 60))
+    new_path = make_artifact('Italy', 'sird_data', 'new')
+    india_path = make_artifact('India', 'preprocessed_data', 'other')
+
+    evict_cache(Country.ITALY, max_bytes=1500)
+    assert exists(legacy_path) and exists(new_path) and exists(india_path)
+    assert not exists(old_path)
+
+
+def test_eviction_removes_orphans(data_root):
+    pre_path = join(io.DATASET_PATH, 'Italy', 'preprocessed_data')
+    io.publish_dict(join(pre_path, 'abc123'), make_origin_dict(['A']), 'test', cube=False)
+    stale_path = make_artifact('Italy', 'preprocessed_data', '.abc123.tmp-0123abcd', fingerprint=False)
+    fresh_path = make_artifact('Italy', 'preprocessed_data', '.abc123.tmp-4567abcd', fingerprint=False)
+    old_path = make_artifact('Italy', '.origin_data.old-89abcdef', fingerprint=False)
+    expired = time() - io.CACHE_ORPHAN_SECONDS - 60
+    published_list = [join(pre_path, name) for name in os.listdir(pre_path) if '.tmp-' not in name]
+    for path in [stale_path, old_path] + published_list:
+        os.utime(path, (expired, expired), follow_symlinks=False)
+
+    evict_cache(Country.ITALY)
+    assert not exists(stale_path) and not exists(old_path)
+    assert exists(fresh_path)
+    assert exists(join(pre_path, 'abc123', 'A.csv'))
+
+
+def test_get_I_df_fingerprints_once(data_root, monkeypatch):
+    save_origin_data(Country.ITALY, make_origin_dict(load_regions(Country.ITALY)))
+    sird_info = PreprocessInfo(country=Country.ITALY, start='2020-03-01', end='2020-04-09',
+                               increase=True, daily=True, remove_zero=True,
+                               smoothing=True, window=5, divide=True, pre_type=PreType.SIRD)
+
+    calls = []
+
+    def count_fingerprint(country):
+        calls.append(country)
+        return io.get_input_fingerprint(country)
+
+    monkeypatch.setattr(nipa, 'get_input_fingerprint', count_fingerprint)
+    monkeypatch.setattr(preprocess, 'get_input_fingerprint', count_fingerprint)
+    nipa.get_I_df(Country.ITALY, sird_info)
+    assert len(calls) == 1
+
+    calls.clear()
+    nipa.get_I_df(Country.ITALY, sird_info)
+    assert len(calls) == 1
+
+
+def test_get_I_df_hit_matches_miss(data_root):
+    save_origin_data(Country.ITALY, make_origin_dict(load_regions(Country.ITALY)))
+    sird_info = PreprocessInfo(country=Country.ITALY, start='2020-03-01', end='2020-04-09',
+                               increase=True, daily=True, remove_zero=True,
+                               smoothing=True, window=5, divide=True, pre_type=PreType.SIRD)
+
+    miss_df = nipa.get_I_df(Country.ITALY, sird_info)
+    hit_df = nipa.get_I_df(Country.ITALY, sird_info)
+    pd.testing.assert_frame_equal(hit_df, miss_df, check_exact=True)
+    assert hit_df.to_numpy().tobytes() == miss_df.to_numpy().tobytes()
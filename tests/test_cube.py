@@ -0,0 +1,101 @@
+from COVID_DataProcessor import io
+from COVID_DataProcessor.datatype import Country, PreprocessInfo, PreType, LazyRegionDict
+from COVID_DataProcessor.io import load_regions, load_origin_data, save_origin_data
+from COVID_DataProcessor.io import load_preprocessed_data
+from COVID_DataProcessor.preprocess.preprocess import preprocess_origin_dict
+from COVID_DataProcessor.util import get_period
+from os.path import join
+
+import pandas as pd
+import numpy as np
+import pytest
+import shutil
+import os
+
+
+def make_origin_dict(regions, n_dates=40, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = get_period('2020-03-01', '2020-12-31', out_date_format='%Y-%m-%d')[:n_dates]
+
+    origin_dict = dict()
+    for i, region in enumerate(regions):
+        confirmed = np.cumsum(rng.integers(0, 50, n_dates))
+        if i % 3 == 0:
+            confirmed[n_dates // 2] = confirmed[n_dates // 2 - 1] - 5
+        deaths = np.cumsum(rng.integers(0, 5, n_dates))
+        recovered = np.cumsum(rng.integers(0, 20, n_dates))
+        origin_df = pd.DataFrame({'confirmed': confirmed, 'deaths': deaths, 'recovered': recovered,
+                                  'active': confirmed - deaths - recovered}, index=dates)
+        origin_df.index.name = 'date'
+        origin_dict.update({region: origin_df})
+
+    return origin_dict
+
+
+def get_country_path(*directories):
+    return join(io.DATASET_PATH, 'Italy', *directories)
+
+
+def assert_same_frames(dict1, dict2):
+    assert list(dict1.keys()) == list(dict2.keys())
+    for region in dict1:
+        assert dict1[region].dtypes.to_dict() == dict2[region].dtypes.to_dict()
+        assert dict1[region].to_csv() == dict2[region].to_csv()
+
+
+def test_origin_cube_keeps_dtypes(data_root):
+    origin_dict = make_origin_dict(load_regions(Country.ITALY))
+    save_origin_data(Country.ITALY, origin_dict)
+
+    cube_dict = load_origin_data(Country.ITALY)
+    assert all(dtype == np.int64 for dtype in cube_dict['Lombardia'].dtypes)
+
+    shutil.rmtree(get_country_path('origin_data', 'cube'))
+    assert_same_frames(cube_dict, load_origin_data(Country.ITALY))
+
+
+def test_preprocessed_cube_keeps_dtypes(data_root):
+    origin_dict = make_origin_dict(load_regions(Country.ITALY))
+    pre_info = PreprocessInfo(country=Country.ITALY, start='2020-03-01', end='2020-04-09',
+                              increase=True, daily=True, remove_zero=False,
+                              smoothing=False, window=0, divide=False, pre_type=PreType.PRE)
+    preprocess_origin_dict(Country.ITALY, origin_dict, pre_info)
+
+    cube_dict = load_preprocessed_data(Country.ITALY, pre_info)
+    regions = list(cube_dict.keys())
+    assert cube_dict[regions[0]]['confirmed'].dtype == np.float64
+    assert cube_dict[regions[1]]['confirmed'].dtype == np.int64
+
+    pre_path = get_country_path('preprocessed_data', pre_info.get_hash())
+    lazy_dict = load_preprocessed_data(Country.ITALY, pre_info, lazy=True)
+    assert_same_frames(cube_dict, {region: lazy_dict[region] for region in lazy_dict})
+
+    shutil.rmtree(join(pre_path, 'cube'))
+    assert_same_frames(cube_dict, load_preprocessed_data(Country.ITALY, pre_info))
+
+
+def test_untyped_cube_falls_back_to_frames(data_root):
+    origin_dict = make_origin_dict(load_regions(Country.ITALY))
+    save_origin_data(Country.ITALY, origin_dict)
+    os.remove(get_country_path('origin_data', 'cube', 'dtypes.npy'))
+
+    loaded_dict = load_origin_data(Country.ITALY)
+    assert_same_frames(origin_dict, loaded_dict)
+    assert load_origin_data(Country.ITALY, as_array=True).dtypes is None
+
+
+def test_lazy_membership_does_not_load():
+    calls = []
+
+    def load_region(region):
+        calls.append(region)
+        return region.upper()
+
+    lazy_dict = LazyRegionDict(['Lombardia', 'Veneto'], load_region)
+    assert 'Veneto' in lazy_dict and 'Sicilia' not in lazy_dict
+    assert calls == []
+
+    assert lazy_dict['Veneto'] == 'VENETO' and lazy_dict['Veneto'] == 'VENETO'
+    assert calls == ['Veneto']
+    with pytest.raises(KeyError):
+        lazy_dict['Sicilia']
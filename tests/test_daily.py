@@ -0,0 +1,111 @@
+from COVID_DataProcessor.preprocess.preprocess import cumulated_to_daily, get_daily_values, get_first_nonzero_index
+from COVID_DataProcessor.preprocess.preprocess import target_to_daily
+
+from tests.test_increase import assert_same_values
+import pandas as pd
+import numpy as np
+import pytest
+
+
+def reference_target_to_daily(target_values):
+    daily_values = []
+    zero_ended = False
+    for i in range(len(target_values) - 1):
+        if zero_ended is False and target_values[i] != 0:
+            zero_ended = True
+            daily_values.append(0)
+        elif zero_ended is False and target_values[i] == 0:
+            daily_values.append(target_values[i])
+        else:
+            daily_values.append(target_values[i + 1] - target_values[i])
+    return daily_values
+
+
+def reference_cumulated_to_daily(target_df, targets):
+    preprocessed_df = target_df.copy(deep=True)
+    new_index = preprocessed_df.index[1:]
+
+    for target in targets:
+        target_values = preprocessed_df[target].to_list()
+        daily_values = reference_target_to_daily(target_values)
+        preprocessed_df.loc[new_index, target] = daily_values
+
+    return preprocessed_df.loc[new_index, :]
+
+
+def make_random_series(rng):
+    n_dates = int(rng.integers(0, 60))
+    values = np.cumsum(rng.integers(-5, 40, n_dates)).astype(float)
+    values[:rng.integers(0, n_dates + 1)] = 0
+    if rng.random() < 0.2:
+        values[rng.integers(0, n_dates + 1):] = 0
+    if n_dates > 0 and rng.random() < 0.2:
+        values[rng.integers(0, n_dates)] = np.nan
+    return values.tolist()
+
+
+EDGE_CASES = {
+    'empty': [],
+    'single': [5],
+    'all zeros': [0, 0, 0, 0],
+    'leading zeros': [0, 0, 3, 5, 9],
+    'first report': [4, 6, 9],
+    'report on the last day': [0, 0, 0, 7],
+    'negative zero': [-0.0, 0.0, -0.0, 2.0, 5.0],
+    'nan before the report': [0, np.nan, 3, 5],
+    'nan after the report': [0, 2, np.nan, 5],
+    'decrease': [0, 5, 3, 8],
+}
+
+
+@pytest.mark.parametrize('values', EDGE_CASES.values(), ids=EDGE_CASES.keys())
+def test_edge_cases_match_reference(values):
+    assert_same_values(reference_target_to_daily(list(values)), target_to_daily(list(values)))
+
+
+def test_random_series_match_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(2000):
+        values = make_random_series(rng)
+        assert_same_values(reference_target_to_daily(values), target_to_daily(values))
+
+
+def test_matrix_matches_reference_rows():
+    rng = np.random.default_rng(1)
+    values = np.cumsum(rng.integers(0, 20, (200, 80)), axis=1).astype(float)
+    for row, first_index in zip(values, rng.integers(0, 90, 200)):
+        row[:first_index] = 0
+    values[:10] = 0
+    values[rng.random(values.shape) < 0.01] = np.nan
+
+    daily_values = get_daily_values(values)
+    for row, daily_row in zip(values, daily_values):
+        assert_same_values(reference_target_to_daily(row.tolist()), daily_row)
+
+
+def test_first_report_day_becomes_zero():
+    values = np.array([[0, 0, 3, 5, 9], [0, 0, 0, 0, 0], [np.nan, 1, 2, 3, 4]])
+    assert get_first_nonzero_index(values).tolist() == [2, 5, 0]
+    assert_same_values([[0, 0, 0, 4], [0, 0, 0, 0], [0, 1, 1, 1]], get_daily_values(values))
+
+
+def test_leading_negative_zero_is_kept():
+    daily_values = target_to_daily([-0.0, -0.0, 1.0, 3.0])
+    assert np.signbit(daily_values[:2]).all()
+    assert np.signbit(reference_target_to_daily([-0.0, -0.0, 1.0, 3.0])[:2]).all()
+
+
+def test_dataset_keeps_reference_dtypes():
+    rng = np.random.default_rng(2)
+    target_df = pd.DataFrame({'confirmed': np.concatenate([[0, 0], np.cumsum(rng.integers(0, 20, 30))]),
+                              'deaths': np.cumsum(rng.integers(0, 3, 32)),
+                              'recovered': np.cumsum(rng.integers(0, 10, 32)).astype(float),
+                              'active': rng.integers(0, 100, 32)},
+                             index=[f'2020-03-{day:02d}' for day in range(1, 33)])
+    targets = ['confirmed', 'deaths', 'recovered']
+
+    expected_df = reference_cumulated_to_daily(target_df, targets)
+    daily_df = cumulated_to_daily(target_df, targets)
+    pd.testing.assert_frame_equal(expected_df, daily_df)
+    assert daily_df['confirmed'].dtype == np.int64
+    assert daily_df['recovered'].dtype == np.float64
@@ -0,0 +1,153 @@
+from COVID_DataProcessor import io
+from COVID_DataProcessor.datatype import Country, get_country_name
+from COVID_DataProcessor.download import download_daily_files, download_raw_data
+from COVID_DataProcessor.io import load_raw_data, load_raw_manifest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+from os.path import join, isfile
+
+import hashlib
+import pytest
+import time
+import os
+
+
+DATES = ['04-12-2020', '04-13-2020', '04-14-2020', '04-15-2020']
+
+
+class RawFileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        name = self.path.rsplit('/', 1)[-1]
+        with server.lock:
+            server.requests.append(name)
+            failing = server.failures.get(name, 0) > 0
+            if failing:
+                server.failures[name] -= 1
+
+        time.sleep(server.delays.get(name, 0))
+        if failing:
+            self.send_error(503)
+        elif name not in server.files:
+            self.send_error(404)
+        elif self.headers.get('If-None-Match') == get_etag(server.files[name]):
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('ETag', get_etag(server.files[name]))
+            self.send_header('Content-Length', str(len(server.files[name])))
+            self.end_headers()
+            self.wfile.write(server.files[name])
+
+        with server.lock:
+            server.completed.append(name)
+
+    def log_message(self, *args):
+        pass
+
+
+def get_etag(content):
+    return f'"{hashlib.sha1(content).hexdigest()}"'
+
+
+def make_daily_file(i):
+    return f'Province_State,Confirmed,Deaths\nAlabama,{10 + i},{i}\nAlaska,{20 + i},{2 * i}\n'.encode()
+
+
+@pytest.fixture
+def raw_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RawFileHandler)
+    server.daemon_threads = True
+    server.lock = Lock()
+    server.files = {f'{date}.csv': make_daily_file(i) for i, date in enumerate(DATES)}
+    server.failures, server.delays = dict(), dict()
+    server.requests, server.completed = list(), list()
+    server.link = f'http://127.0.0.1:{server.server_address[1]}/'
+
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get_raw_path(country, date):
+    return join(io.DATASET_PATH, get_country_name(country), 'raw_data', f'{date}.csv')
+
+
+def test_server_errors_are_retried(data_root, raw_server):
+    raw_server.failures.update({f'{DATES[1]}.csv': 2})
+
+    raw_dict = download_daily_files(Country.US, raw_server.link, DATES, max_workers=2)
+    assert list(raw_dict.keys()) == DATES
+    assert raw_server.requests.count(f'{DATES[1]}.csv') == 3
+    assert raw_dict[DATES[1]]['Confirmed'].tolist() == [11, 21]
+
+
+def test_keys_follow_the_period_not_completion(data_root, raw_server):
+    raw_server.delays.update({f'{DATES[0]}.csv': 0.3})
+
+    raw_dict = download_daily_files(Country.US, raw_server.link, DATES, max_workers=4)
+    assert raw_server.completed[-1] == f'{DATES[0]}.csv'
+    assert list(raw_dict.keys()) == DATES
+    for i, date in enumerate(DATES):
+        assert raw_dict[date]['Confirmed'].tolist() == [10 + i, 20 + i]
+
+
+def test_missing_file_is_skipped(data_root, raw_server):
+    del raw_server.files[f'{DATES[2]}.csv']
+
+    raw_dict = download_daily_files(Country.US, raw_server.link, DATES, max_workers=2, incremental=True)
+    assert list(raw_dict.keys()) == [DATES[0], DATES[1], DATES[3]]
+    assert not isfile(get_raw_path(Country.US, DATES[2]))
+    assert DATES[2] not in load_raw_manifest(Country.US).index
+
+
+def test_second_incremental_run_sends_no_requests(data_root, raw_server):
+    download_daily_files(Country.US, raw_server.link, DATES, max_workers=2, incremental=True)
+    assert sorted(raw_server.requests) == [f'{date}.csv' for date in DATES]
+
+    raw_server.requests.clear()
+    assert download_daily_files(Country.US, raw_server.link, DATES, max_workers=2, incremental=True) == dict()
+    assert raw_server.requests == []
+
+
+def test_deleted_daily_file_is_the_only_refetch(data_root, raw_server):
+    download_daily_files(Country.US, raw_server.link, DATES, max_workers=2, incremental=True)
+    os.remove(get_raw_path(Country.US, DATES[1]))
+
+    raw_server.requests.clear()
+    raw_dict = download_daily_files(Country.US, raw_server.link, DATES, max_workers=2, incremental=True)
+    assert raw_server.requests == [f'{DATES[1]}.csv']
+    assert list(raw_dict.keys()) == [DATES[1]]
+    assert isfile(get_raw_path(Country.US, DATES[1]))
+
+
+def test_not_modified_daily_files_are_kept(data_root, raw_server):
+    download_daily_files(Country.US, raw_server.link, DATES, incremental=True)
+    mtime = os.stat(get_raw_path(Country.US, DATES[0])).st_mtime_ns
+
+    raw_server.requests.clear()
+    assert download_daily_files(Country.US, raw_server.link, DATES, incremental=True, revalidate=True) == dict()
+    assert len(raw_server.requests) == len(DATES)
+    assert os.stat(get_raw_path(Country.US, DATES[0])).st_mtime_ns == mtime
+
+
+def test_not_modified_national_file_is_reused(data_root, raw_server):
+    raw_server.files.update({'italy.csv': b'data,denominazione_regione,totale_casi,deceduti,dimessi_guariti,casi_testati\n'
+                                          b'2020-02-24T18:00:00,Lombardia,172,6,0,\n'})
+    link_df = io.load_links()
+    link_df.loc['Italy', 'link'] = f'{raw_server.link}italy.csv'
+    link_df.to_csv(join(io.DATASET_PATH, 'links.csv'))
+
+    first_dict = download_raw_data(Country.ITALY)
+    file_path = get_raw_path(Country.ITALY, 'Italy')
+    mtime = os.stat(file_path).st_mtime_ns
+
+    second_dict = download_raw_data(Country.ITALY)
+    assert raw_server.requests == ['italy.csv', 'italy.csv']
+    assert os.stat(file_path).st_mtime_ns == mtime
+    assert second_dict['Italy'].equals(load_raw_data(Country.ITALY)['Italy'])
+    assert second_dict['Italy'].equals(first_dict['Italy'])
+    assert download_raw_data(Country.ITALY, incremental=True) == dict()
@@ -0,0 +1,128 @@
+from COVID_DataProcessor.preprocess.preprocess import dataset_to_increased, get_increased_values, target_to_increased
+from copy import copy
+
+import pandas as pd
+import numpy as np
+import pytest
+
+
+def reference_target_to_increased(target_values):
+    for i in range(1, len(target_values)):
+        if target_values[i] - target_values[i - 1] < 0:
+            max_index = reference_get_max_index(target_values, i)
+            target_values = reference_interpolate(target_values, i - 1, max_index)
+
+    return target_values
+
+
+def reference_get_max_index(region_values, broken_index):
+    start_value = region_values[broken_index - 1]
+
+    index = broken_index + 1
+    while index < len(region_values):
+        if start_value <= region_values[index]:
+            return index
+        index += 1
+
+    return -1
+
+
+def reference_interpolate(region_values, start_index, end_index):
+    region_values = copy(region_values)
+
+    if end_index == -1:
+        tail_len = len(region_values[start_index:])
+        tail = [region_values[start_index] for i in range(tail_len)]
+        region_values[start_index:] = tail
+        return region_values
+
+    step = end_index - start_index
+    theta = (region_values[end_index] - region_values[start_index]) / step
+
+    step = 1
+    for i in range(start_index + 1, end_index + 1):
+        region_values[i] = region_values[start_index] + (theta * step)
+        step += 1
+
+    return region_values
+
+
+def reference_dataset_to_increased(target_df, targets):
+    preprocessed_df = target_df.copy(deep=True)
+
+    for target in targets:
+        target_values = target_df[target].to_list()
+        preprocessed_df[target] = reference_target_to_increased(target_values)
+
+    return preprocessed_df
+
+
+def assert_same_values(expected, actual):
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    assert expected.shape == actual.shape
+    assert np.array_equal(expected, actual, equal_nan=True)
+
+
+def make_random_series(rng):
+    n_dates = int(rng.integers(1, 60))
+    values = np.cumsum(rng.integers(-20, 40, n_dates)).astype(float)
+    if rng.random() < 0.3:
+        values[:rng.integers(0, n_dates)] = 0
+    if rng.random() < 0.2:
+        values[rng.integers(0, n_dates)] = np.nan
+    return values.tolist()
+
+
+EDGE_CASES = {
+    'empty': [],
+    'single': [7],
+    'all zeros': [0, 0, 0, 0],
+    'leading zeros': [0, 0, 0, 3, 5, 4, 9],
+    'monotone': [1, 2, 2, 3, 10],
+    'non-monotone': [5, 3, 8, 2, 9, 1, 10],
+    'never recovers': [10, 12, 4, 5, 6],
+    'dip at the end': [1, 2, 3, 1],
+    'negative': [-3, -5, -1, -2, 0],
+    'nan inside': [1, 2, np.nan, 1, 4],
+    'nan after dip': [5, 3, np.nan, 6, 7],
+    'floats': [0.5, 0.25, 0.75, 0.7, 1.5],
+}
+
+
+@pytest.mark.parametrize('values', EDGE_CASES.values(), ids=EDGE_CASES.keys())
+def test_edge_cases_match_reference(values):
+    assert_same_values(reference_target_to_increased(list(values)), target_to_increased(list(values)))
+
+
+def test_random_series_match_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(2000):
+        values = make_random_series(rng)
+        assert_same_values(reference_target_to_increased(values), target_to_increased(values))
+
+
+def test_matrix_matches_reference_rows():
+    rng = np.random.default_rng(1)
+    values = np.cumsum(rng.integers(-10, 20, (200, 80)), axis=1).astype(float)
+    values[rng.random(values.shape) < 0.01] = np.nan
+
+    original_values = values.copy()
+    increased_values, _ = get_increased_values(values)
+    for row, increased_row in zip(values, increased_values):
+        assert_same_values(reference_target_to_increased(row.tolist()), increased_row)
+
+    assert_same_values(original_values, values)
+
+
+def test_dataset_keeps_reference_dtypes():
+    rng = np.random.default_rng(2)
+    target_df = pd.DataFrame({'confirmed': np.cumsum(rng.integers(-5, 20, 50)),
+                              'deaths': np.cumsum(rng.integers(0, 3, 50)),
+                              'recovered': np.cumsum(rng.integers(0, 10, 50)).astype(float),
+                              'active': rng.integers(0, 100, 50)})
+    targets = ['confirmed', 'deaths', 'recovered']
+
+    expected_df = reference_dataset_to_increased(target_df, targets)
+    increased_df = dataset_to_increased(target_df, targets)
+    pd.testing.assert_frame_equal(expected_df, increased_df)
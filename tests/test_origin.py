@@ -0,0 +1,89 @@
+from COVID_DataProcessor import io
+from COVID_DataProcessor.datatype import Country
+from COVID_DataProcessor.download import get_origin_data
+from COVID_DataProcessor.util import get_period
+from os.path import join
+
+import pandas as pd
+import numpy as np
+import pytest
+import shutil
+import os
+
+
+START_DATE, END_DATE = '2020-03-18', '2020-03-26'
+
+
+def get_china_origin_reference(raw_path, regions):
+    # origin pipeline before per-country schemas: every raw file is parsed with inferred dtypes
+    query_period = get_period(START_DATE, END_DATE, out_date_format='%m-%d-%Y')
+    index_period = get_period(START_DATE, END_DATE, out_date_format='%Y-%m-%d')
+
+    raw_dfs = list()
+    for name in query_period:
+        raw_df = pd.read_csv(join(raw_path, f'{name}.csv')).rename(columns=io.CSSE_COLUMN_NAMES)
+        if 'Active' not in raw_df.columns:
+            raw_df['Active'] = raw_df['Confirmed'].fillna(0) - raw_df['Deaths'].fillna(0) - raw_df['Recovered'].fillna(0)
+        raw_dfs.append(raw_df)
+
+    raw_df = pd.concat(raw_dfs, keys=index_period, names=['date', None]).reset_index(level='date')
+    raw_df = raw_df.loc[raw_df['Country_Region'] == np.where(raw_df['date'] < '2020-03-22', 'Mainland China', 'China')]
+    raw_df = raw_df.rename(columns={'Province_State': 'region', 'Confirmed': 'confirmed', 'Deaths': 'deaths',
+                                    'Recovered': 'recovered', 'Active': 'active'})
+
+    columns = ['confirmed', 'deaths', 'recovered', 'active']
+    wide_df = raw_df.groupby(['date', 'region'])[columns].sum().unstack('region', fill_value=0)
+    wide_df = wide_df.reindex(index=index_period, columns=pd.MultiIndex.from_product([columns, regions]), fill_value=0)
+    wide_df.index.name = 'date'
+    return {region: wide_df.xs(region, axis=1, level=1).to_csv() for region in regions}
+
+
+def write_china_raw_files(raw_path, regions, missing_recovered=False, seed=0):
+    rng = np.random.default_rng(seed)
+    for i, date in enumerate(get_period(START_DATE, END_DATE, out_date_format='%m-%d-%Y')):
+        n = len(regions)
+        raw_df = pd.DataFrame({'Confirmed': rng.integers(0, 10 ** 5, n), 'Deaths': rng.integers(0, 10 ** 3, n),
+                               'Recovered': rng.integers(0, 10 ** 4, n)})
+        if missing_recovered and i == 2:
+            raw_df['Recovered'] = raw_df['Recovered'].where(rng.random(n) > 0.2)
+
+        if date < '03-22-2020':
+            raw_df.insert(0, 'Province/State', regions)
+            raw_df.insert(1, 'Country/Region', 'Mainland China')
+            raw_df.insert(2, 'Last Update', '2020-03-18T12:13:09')
+        else:
+            raw_df.insert(0, 'FIPS', np.nan)
+            raw_df.insert(1, 'Province_State', regions)
+            raw_df.insert(2, 'Country_Region', 'China')
+            raw_df.insert(3, 'Last_Update', '2020-03-22 23:45:00')
+            raw_df['Active'] = raw_df['Confirmed'] - raw_df['Deaths'] - raw_df['Recovered'].fillna(0)
+        raw_df.to_csv(join(raw_path, f'{date}.csv'), index=False)
+
+
+@pytest.fixture
+def china_root(data_root):
+    country_path = join(io.DATASET_PATH, 'China')
+    os.makedirs(join(country_path, 'raw_data'))
+    shutil.copy(join('dataset', 'China', 'population.csv'), join(country_path, 'population.csv'))
+
+    link_df = io.load_links()
+    link_df.loc['China', ['start_date', 'end_date']] = [START_DATE, END_DATE]
+    link_df.to_csv(join(io.DATASET_PATH, 'links.csv'))
+    return country_path
+
+
+@pytest.mark.parametrize('missing_recovered', [False, True])
+def test_china_origin_files_are_byte_identical(china_root, missing_recovered):
+    regions = io.load_regions(Country.CHINA)
+    raw_path = join(china_root, 'raw_data')
+    write_china_raw_files(raw_path, regions, missing_recovered)
+
+    get_origin_data(Country.CHINA)
+
+    reference = get_china_origin_reference(raw_path, regions)
+    for region in regions:
+        with open(join(china_root, 'origin_data', f'{region}.csv')) as f:
+            assert f.read() == reference[region]
+
+    with open(join(china_root, 'origin_data', f'{regions[0]}.csv')) as f:
+        assert ('.0' in f.read()) == missing_recovered
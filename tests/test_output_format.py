@@ -0,0 +1,62 @@
+from COVID_DataProcessor import io
+from COVID_DataProcessor.datatype import Country, PreprocessInfo, PreType
+from COVID_DataProcessor.io import load_preprocessed_data, load_first_confirmed_date, save_first_confirmed_date
+from COVID_DataProcessor.io import save_preprocessed_dict, write_frame, read_frame, load_format_marker
+from os.path import join, isfile, realpath
+
+from tests.test_cube import make_origin_dict
+import pandas as pd
+import pytest
+import os
+
+
+@pytest.fixture
+def pre_info():
+    return PreprocessInfo(country=Country.ITALY, start='2020-03-01', end='2020-04-09',
+                          increase=True, daily=True, remove_zero=True,
+                          smoothing=False, window=0, divide=False, pre_type=PreType.PRE)
+
+
+def test_format_is_recorded_per_directory(data_root, pre_info):
+    regions = io.load_regions(Country.ITALY)
+    data_dict = make_origin_dict(regions)
+    save_preprocessed_dict(Country.ITALY, pre_info, data_dict, output_format='parquet')
+    save_preprocessed_dict(Country.ITALY, pre_info, data_dict, base_path=io.RESULT_PATH, output_format='csv.gz')
+
+    pre_path = join(io.DATASET_PATH, 'Italy', 'preprocessed_data', pre_info.get_hash())
+    assert load_format_marker(pre_path) == 'parquet'
+    assert load_format_marker(join(io.RESULT_PATH, 'preprocessed', pre_info.get_hash())) == 'csv.gz'
+
+    loaded_dict = load_preprocessed_data(Country.ITALY, pre_info, lazy=True)
+    assert isfile(join(pre_path, f'{regions[0]}.parquet'))
+    pd.testing.assert_frame_equal(loaded_dict[regions[0]], data_dict[regions[0]])
+
+
+def test_rewriting_a_frame_replaces_its_old_format(data_root):
+    base_path = io.get_safe_path([io.RESULT_PATH, 'SIRD', 'Italy'])
+    first_df = pd.DataFrame({'first_confirmed_date': ['2020-03-01']}, index=pd.Index(['Lombardia'], name='regions'))
+
+    save_first_confirmed_date(Country.ITALY, first_df, base_path, output_format='parquet')
+    save_first_confirmed_date(Country.ITALY, first_df.replace('2020-03-01', '2020-03-02'), base_path)
+
+    assert not isfile(join(base_path, 'first_confirmed_date.parquet'))
+    assert load_first_confirmed_date(Country.ITALY).loc['Lombardia', 'first_confirmed_date'] == '2020-03-02'
+
+
+def test_read_frame_without_marker_probes_formats(tmp_path):
+    frame_df = pd.DataFrame({'value': [1, 2]}, index=pd.Index(['a', 'b'], name='regions'))
+    write_frame(frame_df, str(tmp_path / 'frame'), output_format='csv.gz')
+    assert not (tmp_path / io.FORMAT_MARKER).exists()
+
+    pd.testing.assert_frame_equal(read_frame(str(tmp_path / 'frame'), 'regions'), frame_df)
+
+
+def test_marker_is_published_with_its_directory(data_root, pre_info):
+    regions = io.load_regions(Country.ITALY)
+    save_preprocessed_dict(Country.ITALY, pre_info, make_origin_dict(regions), output_format='parquet')
+    pre_path = join(io.DATASET_PATH, 'Italy', 'preprocessed_data', pre_info.get_hash())
+    save_preprocessed_dict(Country.ITALY, pre_info, make_origin_dict(regions, seed=1), output_format='csv.gz')
+
+    assert load_format_marker(pre_path) == 'csv.gz'
+    assert sorted(os.listdir(realpath(pre_path))) == sorted([io.FORMAT_MARKER, 'cube'] +
+                                                            [f'{region}.csv.gz' for region in regions])
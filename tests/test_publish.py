@@ -0,0 +1,79 @@
+from COVID_DataProcessor import io
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join, islink
+
+import pandas as pd
+import pytest
+import os
+
+
+def make_data_dict(value):
+    data_df = pd.DataFrame({'confirmed': [value, value + 1]}, index=['2020-03-01', '2020-03-02'])
+    data_df.index.name = 'date'
+    return {'A': data_df, 'B': data_df + 1}
+
+
+def load_value(target_path):
+    return pd.read_csv(join(target_path, 'A.csv'), index_col='date')['confirmed'].iloc[0]
+
+
+def get_hidden_entries(parent_path):
+    return sorted(name for name in os.listdir(parent_path) if name.startswith('.'))
+
+
+def test_publish_replaces_previous_version(tmp_path):
+    target_path = str(tmp_path / 'abc123')
+    for value in range(3):
+        io.publish_dict(target_path, make_data_dict(value), 'test')
+        assert load_value(target_path) == value
+
+    assert islink(target_path)
+    assert len(get_hidden_entries(tmp_path)) == 1
+
+
+def test_publish_migrates_plain_directory(tmp_path):
+    target_path = str(tmp_path / 'abc123')
+    os.makedirs(target_path)
+    make_data_dict(0)['A'].to_csv(join(target_path, 'A.csv'))
+
+    io.publish_dict(target_path, make_data_dict(5), 'test')
+    assert load_value(target_path) == 5
+    assert len(get_hidden_entries(tmp_path)) == 1
+
+
+def test_concurrent_publishers(tmp_path):
+    target_path = str(tmp_path / 'abc123')
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda value: io.publish_dict(target_path, make_data_dict(value), 'test'), range(32)))
+
+    assert load_value(target_path) in range(32)
+    assert not any('.tmp-' in name or '.link-' in name for name in os.listdir(tmp_path))
+
+
+def test_publish_without_symlinks(tmp_path, monkeypatch):
+    def fail_symlink(*args, **kwargs):
+        raise OSError('symbolic links are not supported')
+
+    monkeypatch.setattr(os, 'symlink', fail_symlink)
+    target_path = str(tmp_path / 'abc123')
+    for value in range(2):
+        io.publish_dict(target_path, make_data_dict(value), 'test')
+        assert load_value(target_path) == value
+
+    assert not islink(target_path)
+    assert get_hidden_entries(tmp_path) == []
+
+
+def test_failed_save_leaves_target_untouched(tmp_path, monkeypatch):
+    target_path = str(tmp_path / 'abc123')
+    io.publish_dict(target_path, make_data_dict(0), 'test')
+
+    def fail_cube(*args, **kwargs):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(io, 'save_cube', fail_cube)
+    with pytest.raises(RuntimeError):
+        io.publish_dict(target_path, make_data_dict(1), 'test')
+
+    assert load_value(target_path) == 0
+    assert len(get_hidden_entries(tmp_path)) == 1
@@ -0,0 +1,155 @@
+from COVID_DataProcessor.preprocess.preprocess import get_zero_removed_values, remove_zero_values, remove_zero_period
+from copy import copy
+
+from tests.test_increase import assert_same_values
+import pandas as pd
+import numpy as np
+import pytest
+
+
+def reference_make_zero_and_negative_removed(target_values):
+    target_values = copy(target_values)
+
+    for i, value in enumerate(target_values):
+        if i == 0: continue
+        if target_values[i-1] <= 0 or value > 0: continue
+
+        max_index = reference_get_nonzero_index(target_values, i)
+        target_values = reference_interpolate(target_values, i - 1, max_index)
+
+    return target_values
+
+
+def reference_get_nonzero_index(region_values, broken_index):
+    index = broken_index + 1
+    while index < len(region_values):
+        if region_values[index] > 0:
+            return index
+        index += 1
+
+    return -1
+
+
+def reference_interpolate(region_values, start_index, end_index):
+    region_values = copy(region_values)
+
+    if end_index == -1:
+        tail_len = len(region_values[start_index:])
+        tail = [region_values[start_index] for i in range(tail_len)]
+        region_values[start_index:] = tail
+        return region_values
+
+    step = end_index - start_index
+    theta = (region_values[end_index] - region_values[start_index]) / step
+
+    step = 1
+    for i in range(start_index + 1, end_index + 1):
+        region_values[i] = region_values[start_index] + (theta * step)
+        step += 1
+
+    return region_values
+
+
+def reference_remove_zero_period(target_df, targets):
+    # the old .loc write raises TypeError on int columns under pandas 3, so the reference lets pandas infer
+    preprocessed_df = target_df.copy(deep=True)
+
+    for target in targets:
+        target_values = target_df[target].to_list()
+        removed_values = reference_make_zero_and_negative_removed(target_values)
+        preprocessed_df[target] = pd.Series(removed_values, index=target_df.index)
+
+    return preprocessed_df
+
+
+def make_random_series(rng):
+    n_dates = int(rng.integers(1, 60))
+    values = rng.integers(0, 50, n_dates).astype(float)
+    values[rng.random(n_dates) < rng.random()] = 0
+    if rng.random() < 0.3:
+        values[rng.random(n_dates) < 0.1] *= -1
+    if rng.random() < 0.2:
+        values[rng.integers(0, n_dates)] = np.nan
+    return values.tolist()
+
+
+EDGE_CASES = {
+    'empty': [],
+    'single zero': [0],
+    'all zeros': [0, 0, 0, 0],
+    'leading zeros': [0, 0, 3, 5, 0, 9],
+    'gap': [4, 0, 0, 10, 12],
+    'zero tail': [4, 6, 0, 0, 0],
+    'zero at the end': [4, 6, 8, 0],
+    'gap then tail': [4, 0, 6, 7, 0, 0],
+    'negative': [5, -2, 0, 8, -1],
+    'all negative': [-3, -5, -1, -2],
+    'nan in gap': [5, 0, np.nan, 0, 9],
+    'nan before gap': [5, np.nan, 0, 7],
+    'nan at the end': [5, 0, 0, np.nan],
+    'floats': [0.5, 0.0, 0.25, -0.75, 1.5],
+}
+
+
+@pytest.mark.parametrize('values', EDGE_CASES.values(), ids=EDGE_CASES.keys())
+def test_edge_cases_match_reference(values):
+    removed_values, _ = get_zero_removed_values(list(values))
+    assert_same_values([reference_make_zero_and_negative_removed(list(values))], removed_values)
+
+
+def test_random_series_match_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(2000):
+        values = make_random_series(rng)
+        removed_values, _ = get_zero_removed_values(values)
+        assert_same_values([reference_make_zero_and_negative_removed(values)], removed_values)
+
+
+def test_matrix_matches_reference_rows():
+    rng = np.random.default_rng(1)
+    values = rng.integers(-5, 50, (200, 80)).astype(float)
+    values[rng.random(values.shape) < 0.3] = 0
+    values[rng.random(values.shape) < 0.01] = np.nan
+    values[:20, -10:] = 0
+
+    original_values = values.copy()
+    removed_values = values.copy()
+    remove_zero_values(removed_values)
+    for row, removed_row in zip(values, removed_values):
+        assert_same_values(reference_make_zero_and_negative_removed(row.tolist()), removed_row)
+
+    assert_same_values(original_values, values)
+
+
+def test_dataset_keeps_reference_dtypes():
+    target_df = pd.DataFrame({'confirmed': [3, 0, 0, 9, 12, 0],
+                              'deaths': [1, 2, 2, 3, 0, 0],
+                              'recovered': [0.0, 4.0, 0.0, 8.0, 9.0, 10.0],
+                              'active': [0, 0, 1, 0, 0, 1]})
+    targets = ['confirmed', 'deaths', 'recovered']
+
+    expected_df = reference_remove_zero_period(target_df, targets)
+    removed_df = remove_zero_period(target_df, targets)
+    pd.testing.assert_frame_equal(expected_df, removed_df)
+    assert removed_df['confirmed'].dtype == np.float64
+    assert removed_df['deaths'].dtype == np.int64
+    assert removed_df['active'].dtype == np.int64
+
+
+def test_long_zero_tail_is_reinterpolated():
+    target_df = pd.DataFrame({'deaths': [1, 2, 2, 0, 0, 0]})
+    expected_df = reference_remove_zero_period(target_df, ['deaths'])
+    pd.testing.assert_frame_equal(expected_df, remove_zero_period(target_df, ['deaths']))
+    assert expected_df['deaths'].dtype == np.float64
+
+
+def test_int_column_upcasts_when_interpolated():
+    target_df = pd.DataFrame({'confirmed': [3, 0, 4]})
+    old_df = target_df.copy(deep=True)
+    with pytest.raises(TypeError):
+        old_df.loc[:, 'confirmed'] = reference_make_zero_and_negative_removed([3, 0, 4])
+
+    removed_df = remove_zero_period(target_df, ['confirmed'])
+    assert removed_df['confirmed'].dtype == np.float64
+    assert removed_df['confirmed'].to_list() == [3.0, 3.5, 4.0]
+    assert target_df['confirmed'].dtype == np.int64
@@ -0,0 +1,44 @@
+from COVID_DataProcessor import io
+from COVID_DataProcessor.datatype import Country, PreprocessInfo, PreType
+from COVID_DataProcessor.io import save_setting, save_setting_row, load_setting, load_setting_index, get_setting_path
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def pre_info():
+    return PreprocessInfo(country=Country.ITALY, start='2020-03-01', end='2020-04-09',
+                          increase=True, daily=True, remove_zero=True,
+                          smoothing=True, window=5, divide=True, pre_type=PreType.PRE)
+
+
+def test_settings_round_trip(data_root, pre_info):
+    save_setting(pre_info, 'pre_info')
+    save_setting(pre_info, 'pre_info')
+
+    with open(get_setting_path('pre_info')) as f:
+        assert len(f.readlines()) == 2
+    assert load_setting('pre_info', pre_info.get_hash()).get_hash() == pre_info.get_hash()
+
+
+def test_fields_with_commas_are_quoted(data_root):
+    first_row = {'hash': 'a1', 'name': 'Bonaire, Sint Eustatius and Saba', 'note': 'say "hi"'}
+    second_row = {'hash': 'b2', 'name': 'Korea, South', 'note': ''}
+    save_setting_row(first_row, 'test_rows')
+    save_setting_row(second_row, 'test_rows')
+
+    setting_df = pd.read_csv(get_setting_path('test_rows'), dtype=str, keep_default_na=False)
+    assert setting_df.to_dict('records') == [first_row, second_row]
+    assert load_setting_index('test_rows') == {'a1': first_row, 'b2': second_row}
+
+
+def test_conflicting_row_is_not_appended(data_root):
+    save_setting_row({'hash': 'a1', 'name': 'Lombardia'}, 'test_rows')
+    with pytest.raises(ValueError):
+        save_setting_row({'hash': 'a1', 'name': 'Veneto'}, 'test_rows')
+
+    io.SETTING_INDEX.clear()
+    assert load_setting_index('test_rows') == {'a1': {'hash': 'a1', 'name': 'Lombardia'}}
+    with open(get_setting_path('test_rows')) as f:
+        assert len(f.readlines()) == 2
@@ -0,0 +1,76 @@
+from COVID_DataProcessor.datatype import Country, PreprocessInfo, PreType
+from COVID_DataProcessor.preprocess.preprocess import get_smoothed_values, smooth, preprocess_dict_windows
+
+from tests.test_cube import make_origin_dict
+import pandas as pd
+import numpy as np
+import pytest
+
+
+WINDOWS = [3, 5, 7, 9, 11]
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 1000, (20, 120)).astype(float)
+
+
+@pytest.fixture
+def missing_values(values):
+    values = values.copy()
+    values[3, 50] = values[4, 1] = values[5, -2] = values[6, 0] = np.nan
+    return values
+
+
+def test_centered_matches_rolling_and_smooth_edges(values):
+    smoothed_values = get_smoothed_values(values, WINDOWS)
+    for window in WINDOWS:
+        half = window // 2
+        rolling_values = pd.DataFrame(values.T).rolling(window, center=True).mean().to_numpy().T
+        np.testing.assert_allclose(smoothed_values[window][:, half:-half], rolling_values[:, half:-half])
+
+        smooth_values = np.array([smooth(row, window) for row in values])
+        np.testing.assert_allclose(smoothed_values[window], smooth_values)
+
+
+def test_centered_keeps_missing_values_local(missing_values):
+    for window, smoothed in get_smoothed_values(missing_values, WINDOWS).items():
+        smooth_values = np.array([smooth(row, window) for row in missing_values])
+        np.testing.assert_allclose(smoothed, smooth_values)
+        assert np.array_equal(np.isnan(smoothed), np.isnan(smooth_values))
+
+
+def test_trailing_matches_rolling(values):
+    for window, smoothed in get_smoothed_values(values, WINDOWS, 'trailing').items():
+        rolling_values = pd.DataFrame(values.T).rolling(window, min_periods=1).mean().to_numpy().T
+        np.testing.assert_allclose(smoothed, rolling_values)
+
+
+@pytest.mark.parametrize('fixture_name', ['values', 'missing_values'])
+def test_ewma_matches_ewm(fixture_name, request):
+    values = request.getfixturevalue(fixture_name)
+    for window, smoothed in get_smoothed_values(values, WINDOWS, 'ewma').items():
+        ewm_values = pd.DataFrame(values.T).ewm(span=window, adjust=False, ignore_na=True).mean().to_numpy().T
+        np.testing.assert_allclose(smoothed, ewm_values)
+
+
+def test_invalid_arguments(values):
+    with pytest.raises(Exception):
+        get_smoothed_values(values, [4])
+    with pytest.raises(Exception):
+        get_smoothed_values(values, [3], 'median')
+
+
+@pytest.mark.parametrize('method', ['centered', 'trailing', 'ewma'])
+def test_test_info_windows_use_method(method):
+    data_dict = {region: region_df.astype(float) + 1 for region, region_df in make_origin_dict(['A', 'B']).items()}
+    test_info = PreprocessInfo(country=Country.ITALY, start='2020-03-01', end='2020-04-09',
+                               increase=False, daily=False, remove_zero=False,
+                               smoothing=False, window=0, divide=False, pre_type=PreType.TEST)
+
+    window_dicts = preprocess_dict_windows(data_dict, [1, 1], test_info, [3, 5], method)
+    for window, window_dict in window_dicts.items():
+        targets = ['confirmed', 'deaths', 'recovered', 'active']
+        expected = get_smoothed_values(data_dict['A'][targets].to_numpy().T, [window], method)[window].T
+        np.testing.assert_allclose(window_dict['A'][targets].to_numpy(dtype=float), expected)